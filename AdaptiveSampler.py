@@ -0,0 +1,105 @@
+# module for adaptive sampling of functions
+import numpy
+
+# maximum distance in pixels between the curve and the drawn line
+TOLERANCE = 0.5
+
+# maximum number of times an interval is halved
+MAX_DEPTH = 6
+
+# intervals whose midpoint is still off by this fraction of their height after the last subdivision are treated as discontinuities
+JUMP_RATIO = 0.4
+
+# refine samples by adding midpoints where the line between two samples is too far away from the curve
+# evaluate takes an array of x values and returns the y values with nan where undefined, y_scale converts units to pixels
+# returns x and y values, with nan inserted where the curve jumps
+def sample_adaptive(evaluate, xs, ys, y_scale, tolerance=TOLERANCE, max_depth=MAX_DEPTH):
+    xs = numpy.asarray(xs, dtype=float)
+    ys = numpy.asarray(ys, dtype=float)
+    if len(xs) < 2:
+        return xs, ys
+
+    # save which intervals between two samples have to be refined
+    refine = numpy.ones(len(xs) - 1, dtype=bool)
+
+    for depth in range(max_depth):
+        indices = numpy.flatnonzero(refine)
+        if len(indices) == 0:
+            break
+
+        # evaluate midpoints of all intervals that have to be refined at once
+        mid_xs = (xs[indices] + xs[indices + 1]) / 2
+        mid_ys = evaluate(mid_xs)
+        left_ys = ys[indices]
+        right_ys = ys[indices + 1]
+
+        # error between the midpoint and the line in pixels
+        with numpy.errstate(invalid="ignore"):
+            error = numpy.abs(mid_ys - (left_ys + right_ys) / 2) * y_scale
+
+        # refine further if the error is too big or the interval contains the border of the domain
+        defined = ~numpy.isnan(numpy.stack([left_ys, mid_ys, right_ys]))
+        border = defined.any(axis=0) & ~defined.all(axis=0)
+        child_refine = border | (error > tolerance)
+
+        # insert midpoints, both halves of an interval inherit its refine flag
+        refine[indices] = child_refine
+        xs = numpy.insert(xs, indices + 1, mid_xs)
+        ys = numpy.insert(ys, indices + 1, mid_ys)
+        refine = numpy.insert(refine, indices + 1, child_refine)
+
+    # check intervals that are still not precise enough after the last subdivision
+    indices = numpy.flatnonzero(refine)
+    mid_xs = (xs[indices] + xs[indices + 1]) / 2
+    mid_ys = evaluate(mid_xs)
+    with numpy.errstate(invalid="ignore"):
+        height = numpy.abs(ys[indices + 1] - ys[indices]) * y_scale
+        error = numpy.abs(mid_ys - (ys[indices] + ys[indices + 1]) / 2) * y_scale
+
+        # a continuous curve is almost straight on a small interval, a jump or pole isn't -> break the line
+        jumps = (height > tolerance) & (error > JUMP_RATIO * height)
+    indices = indices[jumps]
+    xs = numpy.insert(xs, indices + 1, mid_xs[jumps])
+    ys = numpy.insert(ys, indices + 1, numpy.nan)
+
+    return xs, ys
+
+# check for every bracket if the curve is defined and continuous between a and b, all brackets are checked at once
+# evaluate takes an array of bracket numbers and an array of x values and returns the y values with nan where undefined
+def are_continuous(evaluate, a, b, y_scale, tolerance=TOLERANCE, max_depth=MAX_DEPTH):
+    a = numpy.asarray(a, dtype=float)
+    b = numpy.asarray(b, dtype=float)
+    brackets = numpy.arange(len(a))
+    left_ys = evaluate(brackets, a)
+    right_ys = evaluate(brackets, b)
+    continuous = ~numpy.isnan(left_ys) & ~numpy.isnan(right_ys)
+
+    # intervals that have to be checked, with the bracket they belong to
+    left_xs, right_xs = a, b
+    for depth in range(max_depth + 1):
+        # intervals of brackets that are already known to be discontinuous don't have to be checked
+        active = continuous[brackets]
+        brackets, left_xs, right_xs, left_ys, right_ys = brackets[active], left_xs[active], right_xs[active], left_ys[active], right_ys[active]
+        if len(brackets) == 0:
+            break
+
+        # evaluate midpoints of all intervals at once
+        mid_xs = (left_xs + right_xs) / 2
+        mid_ys = evaluate(brackets, mid_xs)
+        continuous[brackets[numpy.isnan(mid_ys)]] = False
+        with numpy.errstate(invalid="ignore"):
+            height = numpy.abs(right_ys - left_ys) * y_scale
+            error = numpy.abs(mid_ys - (left_ys + right_ys) / 2) * y_scale
+
+        if depth == max_depth:
+            # a continuous curve is almost straight on a small interval, a jump or pole isn't
+            continuous[brackets[(height > tolerance) & (error > JUMP_RATIO * height)]] = False
+            break
+
+        # halve the intervals where the line is too far away from the curve
+        refine = error > tolerance
+        brackets = numpy.concatenate((brackets[refine], brackets[refine]))
+        left_xs, right_xs = numpy.concatenate((left_xs[refine], mid_xs[refine])), numpy.concatenate((mid_xs[refine], right_xs[refine]))
+        left_ys, right_ys = numpy.concatenate((left_ys[refine], mid_ys[refine])), numpy.concatenate((mid_ys[refine], right_ys[refine]))
+
+    return continuous
@@ -0,0 +1,100 @@
+# Headless batch renderer that saves plots of many function sets as PNG files, without a display
+# The batch file has one JSON object per line with the functions f, g, h, ... as a list of strings,
+# the viewport as [min_x, max_x, min_y, max_y] (optional), the image size as [width, height] (optional) and the output file.
+# Example: {"functions": ["x^2", "sin(f(x))"], "viewport": [-5, 5, -4, 4], "size": [1000, 720], "output": "plot.png"}
+# The plots are rendered on all cores by a process pool.
+# Usage: python BatchRenderer.py batch.jsonl [--processes N]
+
+import os
+import sys
+import json
+import signal
+import argparse
+import multiprocessing
+from time import time
+
+# render without a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from GraphPlotter import GraphPlotter
+from FunctionGraph import FunctionGraph
+
+# size of a plot if the batch file doesn't contain one
+DEFAULT_SIZE = (1000, 720)
+
+# graph plotters of the worker process, saved by their size so the label and grid caches are reused
+graph_plotters = {}
+
+# initialize pygame in a worker process
+# pygame installs a handler for SIGTERM, the default one is restored so the pool can still stop the worker
+def init_worker():
+    pygame.init()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+# get the graph plotter of the worker process for a size
+def get_graph_plotter(size):
+    graph_plotter = graph_plotters.get(size)
+    if graph_plotter is None:
+        graph_plotter = GraphPlotter(pygame.Surface(size), size[0], size[1])
+        graph_plotters[size] = graph_plotter
+    return graph_plotter
+
+# render one plot and save it, returns the output file and an error message (None if the plot was saved)
+def render_plot(plot):
+    try:
+        size = tuple(plot.get("size", DEFAULT_SIZE))
+        graph_plotter = get_graph_plotter(size)
+
+        # plots without a viewport get the default view, not the one of the previous plot with the same size
+        graph_plotter.set_view(*plot.get("viewport", (-size[0] / 100, size[0] / 100, -size[1] / 100, size[1] / 100)))
+
+        # compile the functions with their references
+        functions = plot["functions"]
+        function_graph = FunctionGraph(graph_plotter.functions)
+        for i in range(len(graph_plotter.functions)):
+            function_graph.set_text(i, functions[i] if i < len(functions) else "")
+        for i in range(len(graph_plotter.functions)):
+            graph_plotter.set_function(function_graph.functions[i], i)
+
+        graph_plotter.draw_graphs()
+        pygame.image.save(graph_plotter.screen, plot["output"])
+        return plot["output"], None
+    except Exception as exception:
+        return plot.get("output"), str(exception)
+
+# read the plots of a batch file
+def read_batch(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip() != ""]
+
+def main():
+    parser = argparse.ArgumentParser(description="Render plots of a batch file to PNG files without a display.")
+    parser.add_argument("batch", help="file with one JSON object per plot")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: number of cores)")
+    arguments = parser.parse_args()
+
+    plots = read_batch(arguments.batch)
+    start_time = time()
+    failed = 0
+    pool = multiprocessing.Pool(arguments.processes, initializer=init_worker)
+    try:
+        # hand out plots in chunks so the workers don't wait for each other
+        chunk_size = max(1, len(plots) // (arguments.processes * 8))
+        for output, error in pool.imap_unordered(render_plot, plots, chunk_size):
+            if error is not None:
+                failed += 1
+                print(f"{output}: {error}", file=sys.stderr)
+    finally:
+        # let the workers exit by themselves once all plots are rendered
+        pool.close()
+        pool.join()
+
+    duration = time() - start_time
+    print(f"Rendered {len(plots) - failed} plots in {duration:.2f} s "
+          f"({len(plots) / max(duration, 1e-9):.1f} plots/s, {arguments.processes} processes), {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
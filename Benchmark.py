@@ -0,0 +1,315 @@
+# Benchmarks for parsing, evaluating, drawing and analysing functions, runs without a display
+# Every benchmark is timed a number of times, the median and the fastest time are saved as JSON.
+# The results can be compared against a stored baseline, benchmarks that got slower than the threshold are reported as regressions.
+# Natively compiled functions are compared with sympy first, strings whose values differ are reported as parity mismatches.
+# Graphs that oscillate faster than the pixels have to be drawn as an envelope at the default view, others as a line.
+# Usage: python Benchmark.py [--output results.json] [--baseline baseline.json] [--save-baseline] [--repeat N] [--threshold 1.2] [--filter name]
+
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from time import perf_counter
+from statistics import median
+
+# render without a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy
+import pygame
+from GraphPlotter import GraphPlotter
+from FunctionGraph import FunctionGraph
+from GraphAnalyser import Analysis
+from Function import Function, normalize_function, compile_function, compile_derivative
+from ExpressionCompiler import compile_native
+from Calculus import evaluate_array
+
+# baseline the results are compared against if no other file is given
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# size of the plotted area, same as the graph area of the window
+WIDTH = 1000
+HEIGHT = 720
+
+# number of frames drawn in every viewport scenario
+FRAMES = 30
+
+# representative sets of functions, at most one for every slot
+FUNCTION_SETS = {
+    "polynomial": ["x^2", "x^3 - 2x + 1", "0.1x^5 - x^3 + 4", "(x - 1)(x + 2)(x - 3)"],
+    "trigonometric": ["sin(x)", "cos(2x)", "tan(x)", "sin(x)cos(3x)", "sin(1/x)"],
+    "calculus": ["integrate(sin(t)/t, (t, 0, x))", "diff(x^3 sin(x), x)", "integrate(t^2, (t, 0, x))", "diff(exp(-x^2), x, 2)"],
+    # functions that oscillate faster than the pixels
+    "dense": ["sin(1000x)", "sin(1/x)", "x*sin(500x)"],
+    # every slot references the previous one
+    "references": ["sin(x)", "f(x)^2", "g(x) + x", "h(x)/2", "i(x) - 1", "j(x)cos(x)", "k(x) + 0.5", "l(x)^2", "m(x) + f(x)", "n(x) - g(x)"],
+}
+
+# typical function strings that have to compile to the same function natively as with sympy, covering every implicit multiplication
+# the ones sympy simplifies to constants or rejects have to be left to sympy
+PARITY_STRINGS = ["x^2", "2x + 1", "3x^2 - 2x + 1", "-x^2", "2^-x", "x^2^2", "1/2x", ".5x", "2.5(x - 1)", "(x + 1)(x - 1)", "(x + 1)2",
+                  "x(x + 1)", "2sin(x)", "sin(x)cos(3x)", "sin (x)", "e^x", "2e", "e(x + 1)", "2pi", "exp(-x^2)", "sqrt(x)", "ln(x)",
+                  "log(x)", "abs(x)", "Abs(x) - 1", "tan(x)/x", "x^(1/3)", "asin(x/10)", "sinh(x) + cosh(x)", "x**3 - x*2",
+                  "x^0", "x + -x", "x - x", "x/x", "(x + 1) - x", "0x", "012", "00", "012.5"]
+
+# strings of PARITY_STRINGS that are left to sympy
+SYMPY_STRINGS = ["x^0", "x + -x", "x - x", "x/x", "(x + 1) - x", "0x", "012"]
+
+
+# compare natively compiled functions with the functions compiled by sympy, returns the strings whose values or constants differ
+# and the strings that are compiled natively although they should be left to sympy or the other way round
+def check_parity():
+    xs = numpy.linspace(-10, 10, 1001)
+    mismatches = []
+    for string in PARITY_STRINGS:
+        native = compile_native(string)
+        if native is None:
+            if string not in SYMPY_STRINGS:
+                mismatches.append(string)
+            continue
+
+        value, function, expression = compile_function(normalize_function(string))
+        if string in SYMPY_STRINGS or function is None or (native[0] is None) != (value is None) or not numpy.allclose(
+                evaluate_array(native[1], xs), evaluate_array(function, xs), rtol=1e-9, atol=1e-12, equal_nan=True):
+            mismatches.append(string)
+    return mismatches
+
+# functions and if their graphs have to be drawn as an envelope at the default view
+DENSE_GRAPHS = {"sin(1000x)": True, "sin(300x)": True, "x*sin(500x)": True, "sin(1/x)": True,
+                "x^2": False, "sin(x)": False, "sin(50x)": False, "tan(x)": False, "1/x": False, "abs(sin(x))": False}
+
+# check which graphs are drawn as an envelope at the default view, returns the functions that are drawn the wrong way
+def check_density():
+    strings = list(DENSE_GRAPHS)
+    graph_plotter = create_graph_plotter(compile_set(strings))
+    return [string for i, string in enumerate(strings)
+            if graph_plotter.is_dense(i, graph_plotter.min_x, graph_plotter.max_x) != DENSE_GRAPHS[string]]
+
+# clear the caches of parsed and derived functions, so every run parses from scratch
+def clear_parse_caches():
+    normalize_function.cache_clear()
+    compile_native.cache_clear()
+    compile_function.cache_clear()
+    compile_derivative.cache_clear()
+
+# compile a set of functions with their references, returns the compiled functions of all ten slots
+def compile_set(strings, slots=10):
+    function_graph = FunctionGraph([Function("") for i in range(slots)])
+    for i in range(slots):
+        function_graph.set_text(i, strings[i] if i < len(strings) else "")
+    return function_graph.functions
+
+# create a graph plotter on a plain surface that shows a set of functions
+def create_graph_plotter(functions):
+    graph_plotter = GraphPlotter(pygame.Surface((WIDTH, HEIGHT)), WIDTH, HEIGHT)
+    for i in range(len(functions)):
+        graph_plotter.set_function(functions[i], i)
+    return graph_plotter
+
+# remove cached samples and the grid layer, so a scenario starts cold
+def reset_graph_plotter(graph_plotter):
+    for function in graph_plotter.functions:
+        function.clear_cache()
+    graph_plotter.grid_layer = None
+    graph_plotter.animation_layer = None
+    graph_plotter.set_view(-WIDTH / 100, WIDTH / 100, -HEIGHT / 100, HEIGHT / 100)
+
+# views of every frame of a scenario as (min_x, max_x, min_y, max_y, animation_x)
+def get_views(scenario):
+    min_x, max_x = -WIDTH / 100, WIDTH / 100
+    min_y, max_y = -HEIGHT / 100, HEIGHT / 100
+    views = []
+    for frame in range(FRAMES):
+        if scenario == "idle":
+            views.append((min_x, max_x, min_y, max_y, max_x))
+        elif scenario == "pan":
+            # move 10 pixels right and 5 pixels up every frame
+            shift_x = frame * 10 * (max_x - min_x) / WIDTH
+            shift_y = frame * 5 * (max_y - min_y) / HEIGHT
+            views.append((min_x + shift_x, max_x + shift_x, min_y + shift_y, max_y + shift_y, max_x + shift_x))
+        elif scenario == "deep_zoom":
+            # zoom towards (1, 0.5) by the zoom speed of the mouse wheel every frame
+            scale = (1 - 0.08) ** (frame * 4)
+            view = (1 + (min_x - 1) * scale, 1 + (max_x - 1) * scale, 0.5 + (min_y - 0.5) * scale, 0.5 + (max_y - 0.5) * scale)
+            views.append(view + (view[1],))
+        elif scenario == "animation":
+            # reveal the graphs from left to right
+            views.append((min_x, max_x, min_y, max_y, min_x + (max_x - min_x) * (frame + 1) / FRAMES))
+    return views
+
+SCENARIOS = ["idle", "pan", "deep_zoom", "animation"]
+
+
+# time a function, setup is called before every run and isn't timed, returns the times of all runs in seconds
+# functions that measure themselves return their time as {"duration": seconds}, it's used instead of the time of the call
+def measure(run, setup=None, repeat=5):
+    times = []
+    for i in range(repeat):
+        if setup is not None:
+            setup()
+        start_time = perf_counter()
+        result = run()
+        end_time = perf_counter()
+        times.append(result["duration"] if isinstance(result, dict) and "duration" in result else end_time - start_time)
+    return times
+
+# benchmark parsing a set of functions, including references
+def benchmark_parse(strings):
+    return lambda: compile_set(strings), clear_parse_caches
+
+# benchmark evaluating the functions of a set at single x values
+def benchmark_get_value(functions):
+    xs = numpy.linspace(-10, 10, 1000).tolist()
+    def run():
+        for function in functions:
+            if function.is_valid():
+                for x in xs:
+                    function.get_value(x)
+    return run, None
+
+# benchmark evaluating the functions of a set at an array of x values
+def benchmark_get_values(functions):
+    xs = numpy.linspace(-10, 10, 100000)
+    def run():
+        for function in functions:
+            if function.is_valid():
+                function.get_values(xs)
+    return run, None
+
+# benchmark drawing the graphs of a set in every frame of a scenario, the animation only draws the newly revealed part
+def benchmark_draw_function(graph_plotter, scenario):
+    views = get_views(scenario)
+    def run():
+        for min_x, max_x, min_y, max_y, animation_x in views:
+            graph_plotter.set_view(min_x, max_x, min_y, max_y)
+            graph_plotter.animation_x = animation_x
+            if scenario == "animation":
+                graph_plotter.draw_animation()
+                continue
+            for i in range(len(graph_plotter.functions)):
+                if graph_plotter.functions[i].is_valid():
+                    graph_plotter.draw_function(i)
+    return run, lambda: reset_graph_plotter(graph_plotter)
+
+# benchmark drawing the grid in every frame of a scenario
+def benchmark_draw_grid(graph_plotter, scenario):
+    views = get_views(scenario)
+    def run():
+        for min_x, max_x, min_y, max_y, animation_x in views:
+            graph_plotter.set_view(min_x, max_x, min_y, max_y)
+            graph_plotter.draw_grid()
+    return run, lambda: reset_graph_plotter(graph_plotter)
+
+# benchmark analysing the graphs of a set on the screen, runs on the calling thread so it isn't disturbed by other work
+def benchmark_analyse_graphs(functions):
+    def run():
+        Analysis(functions, -WIDTH / 100, WIDTH / 100, -HEIGHT / 100, HEIGHT / 100, HEIGHT).run(lambda: False)
+    return run, None
+
+# benchmark the time from starting Main.py in a new interpreter until the first frame is drawn
+# Main.py goes through its whole startup without a window and prints the time to its first frame as its last line
+def benchmark_cold_start():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    environment = {**os.environ, "SDL_VIDEODRIVER": "dummy", "GRAPH_PLOTTER_FIRST_FRAME_ONLY": "1"}
+    def run():
+        process = subprocess.run([sys.executable, "Main.py"], cwd=directory, env=environment, check=True, capture_output=True, text=True)
+        return {"duration": float(process.stdout.strip().splitlines()[-1])}
+    return run, None
+
+# get all benchmarks by their names, benchmarks are created when they are run so filtered ones don't cost anything
+def get_benchmarks():
+    benchmarks = {}
+    for name, strings in FUNCTION_SETS.items():
+        benchmarks[f"parse_function/{name}"] = lambda strings=strings: benchmark_parse(strings)
+        benchmarks[f"get_value/{name}"] = lambda strings=strings: benchmark_get_value(compile_set(strings))
+        benchmarks[f"get_values/{name}"] = lambda strings=strings: benchmark_get_values(compile_set(strings))
+        for scenario in SCENARIOS:
+            benchmarks[f"draw_function/{name}/{scenario}"] = lambda strings=strings, scenario=scenario: benchmark_draw_function(
+                create_graph_plotter(compile_set(strings)), scenario)
+        benchmarks[f"analyse_graphs/{name}"] = lambda strings=strings: benchmark_analyse_graphs(compile_set(strings))
+    benchmarks["cold_start/first_frame"] = benchmark_cold_start
+    for scenario in SCENARIOS:
+        benchmarks[f"draw_grid/{scenario}"] = lambda scenario=scenario: benchmark_draw_grid(create_graph_plotter([]), scenario)
+    return benchmarks
+
+# run all benchmarks whose name contains the filter, returns the results by benchmark name
+def run_benchmarks(repeat, name_filter=None):
+    results = {}
+    for name, create in get_benchmarks().items():
+        if name_filter is not None and name_filter not in name:
+            continue
+        run, setup = create()
+
+        # the first run warms up imports and caches that live longer than one run
+        measure(run, setup, 1)
+        times = measure(run, setup, repeat)
+        results[name] = {"median": median(times), "min": min(times), "repeat": repeat}
+        print(f"{name}: {median(times) * 1000:.2f} ms", file=sys.stderr)
+    return results
+
+# compare results against a baseline, returns the names of the benchmarks that are slower by more than the threshold
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name}: not in baseline", file=sys.stderr)
+            continue
+        ratio = result["median"] / max(baseline[name]["median"], 1e-9)
+        if ratio > threshold:
+            regressions.append(name)
+        print(f"{name}: {baseline[name]['median'] * 1000:.2f} ms -> {result['median'] * 1000:.2f} ms "
+              f"({ratio:.2f}x){' REGRESSION' if ratio > threshold else ''}", file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parser, evaluator, renderer and analyser without a display.")
+    parser.add_argument("--output", help="file to save the results as JSON (default: standard output)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help=f"results to compare against (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs of every benchmark (default: 5)")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="ratio to the baseline above which a benchmark is a regression (default: 1.2)")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this string")
+    arguments = parser.parse_args()
+
+    pygame.init()
+    mismatches = check_parity()
+    for string in mismatches:
+        print(f"parity: {string} differs between the native compiler and sympy", file=sys.stderr)
+    wrongly_drawn = check_density()
+    for string in wrongly_drawn:
+        print(f"density: {string} isn't drawn as {'an envelope' if DENSE_GRAPHS[string] else 'a line'}", file=sys.stderr)
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": numpy.__version__,
+        "parity_mismatches": mismatches,
+        "density_mismatches": wrongly_drawn,
+        "benchmarks": run_benchmarks(arguments.repeat, arguments.filter),
+    }
+
+    output = json.dumps(results, indent=2)
+    if arguments.output is None:
+        print(output)
+    else:
+        with open(arguments.output, "w") as file:
+            file.write(output)
+
+    if arguments.save_baseline:
+        with open(arguments.baseline, "w") as file:
+            file.write(output)
+    elif os.path.exists(arguments.baseline):
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)["benchmarks"]
+        regressions = compare(results["benchmarks"], baseline, arguments.threshold)
+        if len(regressions) > 0:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+    if len(mismatches) > 0 or len(wrongly_drawn) > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
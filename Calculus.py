@@ -0,0 +1,167 @@
+# module for evaluating integrals and derivatives that sympy can't resolve symbolically
+# unresolved integrals are replaced by cumulative quadrature and unresolved derivatives by finite differences, both on whole arrays at once
+import math
+import numpy
+import sympy
+
+# nodes and weights of the 15 point Gauss-Kronrod rule on [-1, 1] and the weights of the embedded 7 point Gauss rule
+# the difference of both rules estimates the error of a panel
+KRONROD_HALF_NODES = [0.991455371120812639206854697526329, 0.949107912342758524526189684047851, 0.864864423359769072789712788640926,
+                      0.741531185599394439863864773280788, 0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+                      0.207784955007898467600689403773245]
+KRONROD_HALF_WEIGHTS = [0.022935322010529224963732008058970, 0.063092092629978553290700663189204, 0.104790010322250183839876322541518,
+                        0.140653259715525918745189590510238, 0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+                        0.204432940075298892414161999234649]
+KRONROD_CENTER_WEIGHT = 0.209482141084727828012999174891714
+GAUSS_HALF_WEIGHTS = [0.129484966168869693270611432679082, 0.279705391489276667901467771423780, 0.381830050505118944950369775488975]
+GAUSS_CENTER_WEIGHT = 0.417959183673469387755102040816327
+
+KRONROD_NODES = numpy.array([-node for node in KRONROD_HALF_NODES] + [0] + KRONROD_HALF_NODES[::-1])
+KRONROD_WEIGHTS = numpy.array(KRONROD_HALF_WEIGHTS + [KRONROD_CENTER_WEIGHT] + KRONROD_HALF_WEIGHTS[::-1])
+GAUSS_WEIGHTS = numpy.zeros(len(KRONROD_NODES))
+GAUSS_WEIGHTS[1:7:2] = GAUSS_HALF_WEIGHTS
+GAUSS_WEIGHTS[7] = GAUSS_CENTER_WEIGHT
+GAUSS_WEIGHTS[9::2] = GAUSS_HALF_WEIGHTS[::-1]
+
+# error a panel may have per unit of its length, or relative to its integral if that's bigger
+TOLERANCE = 1e-10
+
+# panels are at most this long at first, so the first estimate can't miss oscillations between its nodes
+MAX_PANEL_WIDTH = 1.0
+
+# maximum number of panels the gaps start with, longer gaps start with wider panels
+MAX_PANELS = 1 << 15
+
+# number of times a panel can be halved
+MAX_DEPTH = 20
+
+# evaluate a function at an array of x values, returns floats with nan where it's undefined
+def evaluate_array(function, xs):
+    with numpy.errstate(all="ignore"):
+        values = numpy.broadcast_to(function(xs), xs.shape)
+        if numpy.iscomplexobj(values):
+            values = numpy.where(values.imag == 0, values.real, numpy.nan)
+        values = numpy.array(values, dtype=float)
+    values[~numpy.isfinite(values)] = numpy.nan
+    return values
+
+# integrate the integrand over every gap from low to high with adaptive Gauss-Kronrod quadrature, all gaps are integrated at once
+# panels are halved until their error is within the tolerance, so the integral of a gap doesn't depend on the other gaps
+# gaps where the integrand is undefined somewhere are nan
+def integrate_gaps(integrand, lows, highs):
+    widths = highs - lows
+    pieces = numpy.maximum(numpy.ceil(widths / MAX_PANEL_WIDTH), 1).astype(int)
+    while pieces.sum() > MAX_PANELS:
+        pieces = numpy.ceil(pieces / 2).astype(int)
+
+    # split the gaps into their first panels
+    owners = numpy.repeat(numpy.arange(len(lows)), pieces)
+    panel_widths = numpy.repeat(widths / pieces, pieces)
+    first_pieces = numpy.repeat(numpy.cumsum(pieces) - pieces, pieces)
+    starts = numpy.repeat(lows, pieces) + (numpy.arange(len(owners)) - first_pieces) * panel_widths
+    ends = starts + panel_widths
+
+    integrals = numpy.zeros(len(lows))
+    for depth in range(MAX_DEPTH + 1):
+        if len(starts) == 0:
+            break
+
+        # evaluate the integrand at the nodes of all panels at once
+        centers = (starts + ends) / 2
+        half_widths = (ends - starts) / 2
+        values = evaluate_array(integrand, (centers[:, None] + KRONROD_NODES * half_widths[:, None]).ravel()).reshape(-1, len(KRONROD_NODES))
+        kronrod = values @ KRONROD_WEIGHTS * half_widths
+        gauss = values @ GAUSS_WEIGHTS * half_widths
+
+        # undefined panels are done as well, they make their gap undefined
+        with numpy.errstate(invalid="ignore"):
+            done = numpy.isnan(kronrod) | (numpy.abs(kronrod - gauss) <= TOLERANCE * numpy.maximum(ends - starts, numpy.abs(kronrod)))
+        if depth == MAX_DEPTH:
+            done[:] = True
+        numpy.add.at(integrals, owners[done], kronrod[done])
+
+        # halve the other panels
+        starts, centers, ends, owners = starts[~done], centers[~done], ends[~done], owners[~done]
+        starts, ends, owners = numpy.concatenate((starts, centers)), numpy.concatenate((centers, ends)), numpy.concatenate((owners, owners))
+
+    return integrals
+
+# integrate the integrand from every low to the high with the same index, all integrals are computed at once
+# all bounds are sorted into one grid, the gaps of the grid are integrated to the tolerance and summed up cumulatively
+def integrate_cumulative(integrand, lows, highs):
+    lows, highs = numpy.broadcast_arrays(numpy.asarray(lows, dtype=float), numpy.asarray(highs, dtype=float))
+    bounds = numpy.concatenate((lows.ravel(), highs.ravel()))
+    points = numpy.unique(bounds[numpy.isfinite(bounds)])
+    if len(points) < 2:
+        return numpy.where(numpy.isfinite(lows) & (lows == highs), 0.0, numpy.nan)
+
+    # sum up the gaps, count undefined gaps separately so they only make the integrals across them undefined
+    integrals = integrate_gaps(integrand, points[:-1], points[1:])
+    undefined = numpy.isnan(integrals)
+    cumulative = numpy.concatenate(([0], numpy.cumsum(numpy.where(undefined, 0, integrals))))
+    cumulative_undefined = numpy.concatenate(([0], numpy.cumsum(undefined)))
+
+    # look up the bounds in the grid
+    def lookup(values):
+        defined = numpy.isfinite(values)
+        indices = numpy.searchsorted(points, numpy.where(defined, values, points[0]))
+        return numpy.where(defined, cumulative[indices], numpy.nan), cumulative_undefined[indices]
+
+    low_integrals, low_undefined = lookup(lows)
+    high_integrals, high_undefined = lookup(highs)
+    return numpy.where(low_undefined == high_undefined, high_integrals - low_integrals, numpy.nan)
+
+# differentiate the function order times at every x value with central differences
+def differentiate(function, xs, order):
+    xs = numpy.asarray(xs, dtype=float)
+    flat_xs = xs.ravel()
+
+    # step size that balances the truncation and the rounding error
+    h = numpy.finfo(float).eps ** (1 / (order + 2)) * numpy.maximum(numpy.abs(flat_xs), 1)
+
+    # evaluate all points of the difference quotient at once
+    offsets = [order / 2 - k for k in range(order + 1)]
+    values = evaluate_array(function, numpy.concatenate([flat_xs + offset * h for offset in offsets])).reshape(order + 1, len(flat_xs))
+    coefficients = [(-1) ** k * math.comb(order, k) for k in range(order + 1)]
+    return (sum(coefficient * value for coefficient, value in zip(coefficients, values)) / h ** order).reshape(xs.shape)
+
+# compile a sympy expression to a function of the arguments that evaluates arrays with numpy
+# integrals and derivatives that couldn't be resolved symbolically are replaced by numeric evaluations
+# the arguments are x followed by the symbols of the referenced functions
+def lambdify_numeric(arguments, expression):
+    x = arguments[0]
+    references = arguments[1:]
+
+    # numeric evaluations by the name of the sympy function that replaces them
+    evaluations = {}
+
+    def replace(node):
+        name = "numeric_" + str(len(evaluations))
+        if isinstance(node, sympy.Integral) and len(node.limits) == 1:
+            limit = node.limits[0]
+            variable = limit[0]
+            if len(limit) == 3 and (variable == x or not node.function.has(x)):
+                # the integrand may only depend on x if x is the variable of integration
+                low, high = limit[1], limit[2]
+            elif len(limit) == 1 and variable == x:
+                # indefinite integrals start at 0
+                low, high = sympy.Integer(0), x
+            else:
+                return node
+
+            integrand = sympy.lambdify((variable,) + references, node.function, modules=[dict(evaluations), "numpy"])
+            evaluations[name] = lambda lows, highs, *functions: integrate_cumulative(
+                lambda ts: integrand(ts, *functions), lows, highs)
+            return sympy.Function(name)(low, high, *references)
+
+        if isinstance(node, sympy.Derivative) and all(variable == x for variable, count in node.variable_count):
+            inner = sympy.lambdify((x,) + references, node.expr, modules=[dict(evaluations), "numpy"])
+            order = node.derivative_count
+            evaluations[name] = lambda xs, *functions: differentiate(lambda ts: inner(ts, *functions), xs, order)
+            return sympy.Function(name)(x, *references)
+
+        return node
+
+    if expression.has(sympy.Integral, sympy.Derivative):
+        expression = expression.replace(lambda node: isinstance(node, (sympy.Integral, sympy.Derivative)), replace)
+    return sympy.lambdify(arguments, expression, modules=[evaluations, "numpy"])
@@ -0,0 +1,46 @@
+import threading
+from queue import Queue, Empty
+
+# class for a background thread that compiles edited functions one after another
+class CompileWorker:
+    def __init__(self):
+        self.jobs = Queue()
+        self.results = Queue()
+
+        # number of the newest job for every key, older jobs with the same key that haven't started yet are skipped
+        self.latest_jobs = {}
+        self.job_count = 0
+
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    # add job to the queue, the job is a function whose return value is saved as the result
+    def submit(self, key, job):
+        self.job_count += 1
+        self.latest_jobs[key] = self.job_count
+        self.jobs.put((key, self.job_count, job))
+
+    # run jobs from the queue and save their results
+    def work(self):
+        while True:
+            key, number, job = self.jobs.get()
+            try:
+                if self.latest_jobs[key] == number:
+                    self.results.put((key, job()))
+            except Exception as exception:
+                print("Compiling failed:", exception)
+            finally:
+                self.jobs.task_done()
+
+    # return the keys and results of finished jobs
+    def get_results(self):
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except Empty:
+                return results
+
+    # wait until all jobs in the queue are finished
+    def wait(self):
+        self.jobs.join()
@@ -0,0 +1,149 @@
+import os
+import numpy
+import threading
+import multiprocessing
+from Function import Function, FUNCTION_NAMES
+
+# number of floats in the shared buffer of every worker, bigger evaluations are split into rounds
+BUFFER_SIZE = 1 << 20
+
+# evaluations that are expected to take less than this many seconds are faster on the calling thread
+MIN_JOB_TIME = 0.001
+
+# compiled functions of a worker process, a function is compiled again when it or a function it references changed
+class WorkerFunctions:
+    def __init__(self):
+        # id, normalized string and referenced names of the function in every slot
+        self.specs = {}
+        self.functions = {}
+
+    # change the function in a slot, the function and all functions depending on it have to be compiled again
+    def set(self, index, function_id, string, names):
+        self.specs[index] = (function_id, string, names)
+        changed = [index]
+        while len(changed) > 0:
+            changed_index = changed.pop()
+            self.functions.pop(changed_index, None)
+            changed += [i for i, spec in self.specs.items()
+                        if FUNCTION_NAMES[changed_index] in spec[2] and i in self.functions]
+
+    # get the compiled function of a slot, the functions it references are compiled first
+    def get(self, index):
+        if index not in self.functions:
+            function_id, string, names = self.specs[index]
+            if string == "Error":
+                self.functions[index] = Function("Error")
+            else:
+                self.functions[index] = Function(string, {name: self.get(FUNCTION_NAMES.index(name)) for name in names})
+        return self.functions[index]
+
+# loop of a worker process, evaluates functions at the x values in the shared buffer and writes the values back into it
+def work(connection, shared_buffer):
+    buffer = numpy.frombuffer(shared_buffer, dtype=float)
+    functions = WorkerFunctions()
+    while True:
+        message = connection.recv()
+        if message[0] == "set":
+            functions.set(*message[1:])
+        elif message[0] == "evaluate":
+            for index, function_id, offset, length, precise in message[1]:
+                xs = buffer[offset:offset + length].copy()
+
+                # functions that were changed since the job was submitted are undefined
+                if index not in functions.specs or functions.specs[index][0] != function_id:
+                    buffer[offset:offset + length] = numpy.nan
+                    continue
+                try:
+                    function = functions.get(index)
+                    buffer[offset:offset + length] = function.get_precise_values(xs) if precise else function.get_values(xs)
+                except Exception:
+                    buffer[offset:offset + length] = numpy.nan
+            connection.send("done")
+        elif message[0] == "close":
+            return
+
+# class for a pool of worker processes that keep compiled copies of the functions and evaluate them in parallel
+# x and y values are passed through a shared buffer of every worker, only the slots, offsets and lengths are sent through pipes
+class EvaluationPool:
+    def __init__(self, processes=None):
+        # the workers are forked so they don't start the program again, the pool isn't used where forking isn't available
+        context = multiprocessing.get_context("fork")
+        self.workers = []
+        for i in range(processes or min(os.cpu_count() or 1, len(FUNCTION_NAMES))):
+            connection, worker_connection = context.Pipe()
+            shared_buffer = context.RawArray("d", BUFFER_SIZE)
+            process = context.Process(target=work, args=(worker_connection, shared_buffer), daemon=True)
+            process.start()
+            self.workers.append((process, connection, numpy.frombuffer(shared_buffer, dtype=float)))
+
+        # the graph plotter and the analysis worker use the pool from different threads
+        self.lock = threading.Lock()
+
+    # send a changed function to all workers, workers only compile the function and the functions depending on it again
+    def set_function(self, index, function):
+        with self.lock:
+            for process, connection, buffer in self.workers:
+                connection.send(("set", index, function.id, function.string, tuple(sorted(function.references))))
+
+    # check if evaluating a function at a number of x values is expected to take long enough to be done by a worker
+    def is_worth(self, function, count, precise=False):
+        return precise or function.cost * count > MIN_JOB_TIME
+
+    # evaluate functions at arrays of x values in parallel, jobs are (slot, function, xs, precise), returns the values of every job
+    # if blocking is off and the pool is busy, nothing is evaluated and None is returned, so drawing never waits for the analysis
+    def evaluate(self, jobs, blocking=True):
+        if not self.lock.acquire(blocking):
+            return None
+        try:
+            return self.evaluate_jobs(jobs)
+        finally:
+            self.lock.release()
+
+    # evaluate the jobs on the workers, the lock has to be held
+    def evaluate_jobs(self, jobs):
+        results = [None] * len(jobs)
+
+        # give the biggest jobs out first, always to the worker with the fewest values
+        rounds = [[[] for worker in self.workers]]
+        loads = [[0] * len(self.workers)]
+        for j in sorted(range(len(jobs)), key=lambda j: -len(jobs[j][2])):
+            length = len(jobs[j][2])
+            if length > BUFFER_SIZE:
+                raise ValueError("Job is bigger than the shared buffer")
+
+            # start a new round if the job doesn't fit into any buffer
+            worker = min(range(len(self.workers)), key=lambda w: loads[-1][w])
+            if loads[-1][worker] + length > BUFFER_SIZE:
+                rounds.append([[] for worker in self.workers])
+                loads.append([0] * len(self.workers))
+                worker = 0
+            rounds[-1][worker].append((j, loads[-1][worker]))
+            loads[-1][worker] += length
+
+        for assigned in rounds:
+            for (process, connection, buffer), worker_jobs in zip(self.workers, assigned):
+                messages = []
+                for j, offset in worker_jobs:
+                    index, function, xs, precise = jobs[j]
+                    buffer[offset:offset + len(xs)] = xs
+                    messages.append((index, function.id, offset, len(xs), precise))
+                    function.evaluations += len(xs)
+                if len(messages) > 0:
+                    connection.send(("evaluate", messages))
+
+            # collect the values when the workers are done
+            for (process, connection, buffer), worker_jobs in zip(self.workers, assigned):
+                if len(worker_jobs) > 0:
+                    connection.recv()
+                    for j, offset in worker_jobs:
+                        results[j] = buffer[offset:offset + len(jobs[j][2])].copy()
+
+        return results
+
+    # stop all workers
+    def close(self):
+        with self.lock:
+            for process, connection, buffer in self.workers:
+                connection.send(("close",))
+            for process, connection, buffer in self.workers:
+                process.join()
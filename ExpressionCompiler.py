@@ -0,0 +1,198 @@
+# module for compiling common expressions to numpy functions without sympy
+# arithmetic, powers, e, pi and elementary functions are tokenized and parsed in one pass, with the same implicit multiplications as normalize_function
+# expressions with anything else aren't compiled here, they're left to sympy, like expressions that might be constant
+import re
+import math
+import numpy
+from functools import lru_cache
+
+# a number, a name or an operator, with the whitespace before it
+TOKEN = re.compile(r"(\s*)(?:(\d+\.?\d*|\.\d+)|([A-Za-z]+)|(\*\*|[-+*/^()]))")
+
+CONSTANTS = {"e": math.e, "pi": math.pi}
+
+# functions of one argument by the name sympy parses them as
+FUNCTIONS = {"sin": numpy.sin, "cos": numpy.cos, "tan": numpy.tan, "asin": numpy.arcsin, "acos": numpy.arccos, "atan": numpy.arctan,
+             "sinh": numpy.sinh, "cosh": numpy.cosh, "tanh": numpy.tanh, "asinh": numpy.arcsinh, "acosh": numpy.arccosh,
+             "atanh": numpy.arctanh, "exp": numpy.exp, "log": numpy.log, "ln": numpy.log, "sqrt": numpy.sqrt,
+             "abs": numpy.abs, "Abs": numpy.abs}
+
+BINARY_OPERATORS = {"+": numpy.add, "-": numpy.subtract, "*": numpy.multiply, "/": numpy.divide}
+
+# x values a compiled function is evaluated at, functions with the same value at all of them might be constants like x - x or x^0
+# sympy simplifies those to constants, so they're left to sympy
+PROBE_XS = numpy.array([-2.7183, -0.5772, 0.3183, 1.4142, 3.1416])
+
+# error for expressions that can't be compiled natively
+class Unsupported(Exception):
+    pass
+
+# split an expression into tokens of (kind, text, spaced), kind is "number", "name" or "operator"
+# spaced tells if there's whitespace before the token, implicit multiplications are only between tokens without whitespace
+def tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None:
+            raise Unsupported()
+        kind = ("number", "name", "operator")[match.lastindex - 2]
+        tokens.append((kind, match.group(match.lastindex), match.group(1) != ""))
+        position = match.end()
+    return tokens
+
+# check if there's an implicit multiplication between two tokens, in the same places normalize_function inserts one
+def is_implicit_multiplication(previous, token):
+    if token is None or token[2]:
+        return False
+    if previous[1] == ")" or previous[0] == "number":
+        return token[0] == "name" or token[1] == "(" or previous[1] == ")" and token[0] == "number"
+
+    # single letters before a bracket are multiplied with it
+    return previous[1] in ("x", "e") and token[1] == "("
+
+# parser for the tokens of an expression, every node is (evaluate, value, has_x)
+# evaluate takes x and the referenced functions, value is the value of constant nodes and has_x tells if the node depends on x
+class Parser:
+    def __init__(self, tokens, names):
+        self.tokens = tokens
+        self.names = names
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise Unsupported()
+        self.position += 1
+        return token
+
+    def expect(self, text):
+        if self.next()[1] != text:
+            raise Unsupported()
+
+    # parse the whole expression, the tokens have to be used up
+    def parse(self):
+        node = self.parse_sum()
+        if self.peek() is not None:
+            raise Unsupported()
+        return node
+
+    def parse_sum(self):
+        node = self.parse_product()
+        while self.peek() is not None and self.peek()[1] in ("+", "-"):
+            node = apply(BINARY_OPERATORS[self.next()[1]], node, self.parse_product())
+        return node
+
+    def parse_product(self):
+        node = self.parse_unary()
+        while True:
+            token = self.peek()
+            if token is not None and token[1] in ("*", "/"):
+                node = apply(BINARY_OPERATORS[self.next()[1]], node, self.parse_unary())
+            elif is_implicit_multiplication(self.tokens[self.position - 1], token):
+                node = apply(numpy.multiply, node, self.parse_unary())
+            else:
+                return node
+
+    # signs bind weaker than powers, -x^2 is -(x^2)
+    def parse_unary(self):
+        token = self.peek()
+        if token is not None and token[1] in ("+", "-"):
+            self.next()
+            node = self.parse_unary()
+            return node if token[1] == "+" else apply(numpy.negative, node)
+        return self.parse_power()
+
+    # powers are right associative and the exponent can have a sign
+    def parse_power(self):
+        node = self.parse_atom()
+        token = self.peek()
+        if token is not None and token[1] in ("**", "^"):
+            self.next()
+            node = apply(numpy.power, node, self.parse_unary())
+        return node
+
+    def parse_atom(self):
+        kind, text, spaced = self.next()
+        if kind == "number":
+            # integers with leading zeros like 012 are syntax errors in python and sympy
+            if text[0] == "0" and "." not in text and text.strip("0") != "":
+                raise Unsupported()
+            return constant(float(text))
+        if text == "(":
+            node = self.parse_sum()
+            self.expect(")")
+            return node
+        if kind != "name":
+            raise Unsupported()
+
+        if text == "x":
+            return (lambda x, references: x), None, True
+        if text in CONSTANTS:
+            return constant(CONSTANTS[text])
+
+        # calls of functions and referenced functions
+        if text in FUNCTIONS or text in self.names:
+            self.expect("(")
+            argument = self.parse_sum()
+            self.expect(")")
+            if text in FUNCTIONS:
+                return apply(FUNCTIONS[text], argument)
+            index = self.names.index(text)
+            evaluate = argument[0]
+            return (lambda x, references: references[index](evaluate(x, references))), None, argument[2]
+
+        raise Unsupported()
+
+# node of a constant, undefined and infinite constants are left to sympy
+def constant(value):
+    if not math.isfinite(value):
+        raise Unsupported()
+    return (lambda x, references: value), value, False
+
+# node of an operation on nodes, operations on constants are computed once
+def apply(operation, *nodes):
+    if all(node[1] is not None for node in nodes):
+        with numpy.errstate(all="ignore"):
+            return constant(float(operation(*[numpy.float64(node[1]) for node in nodes])))
+
+    has_x = any(node[2] for node in nodes)
+    if len(nodes) == 1:
+        a = nodes[0][0]
+        return (lambda x, references: operation(a(x, references))), None, has_x
+    a, b = nodes[0][0], nodes[1][0]
+    return (lambda x, references: operation(a(x, references), b(x, references))), None, has_x
+
+# compile a function string to a function of x and the referenced functions in the order of names
+# returns the value (if the function is a constant), the function and if it depends on x, None if it can't be compiled without sympy
+@lru_cache(maxsize=1024)
+def compile_native(function, names=()):
+    try:
+        tokens = tokenize(function.strip())
+        if len(tokens) == 0:
+            return None
+        root, value, has_x = Parser(tokens, names).parse()
+    except Unsupported:
+        return None
+
+    def evaluate(x, *references):
+        with numpy.errstate(all="ignore"):
+            result = root(x, references)
+
+        # undefined values of single numbers are nan like the values of arrays
+        if numpy.ndim(result) == 0 and not numpy.isfinite(result):
+            return numpy.nan
+        return result
+
+    # functions that call other functions are checked once the functions are known
+    if value is None and len(names) == 0 and might_be_constant(evaluate):
+        return None
+    return value, evaluate, has_x
+
+# check if a compiled function has the same value at all probe xs
+def might_be_constant(evaluate):
+    probes = evaluate(PROBE_XS)
+    return numpy.ndim(probes) == 0 or bool(numpy.all(numpy.isfinite(probes)) and numpy.allclose(probes, probes[0], rtol=1e-12, atol=1e-15))
@@ -0,0 +1,29 @@
+import pygame
+import threading
+
+# class for the fonts of the program, every font is only loaded once and shared by everything that draws text
+# looking up the installed fonts takes long on some systems, so it's started on a background thread and only waited for when a font is needed
+class FontRegistry:
+    def __init__(self):
+        # fonts by their name and size
+        self.fonts = {}
+        self.loading = None
+
+    # start looking up the installed fonts in the background
+    def load_system_fonts(self):
+        if self.loading is None:
+            self.loading = threading.Thread(target=pygame.font.get_fonts, daemon=True)
+            self.loading.start()
+
+    # get a system font, the font is loaded when it's first used
+    def get(self, name, size):
+        font = self.fonts.get((name, size))
+        if font is None:
+            if self.loading is not None:
+                self.loading.join()
+            font = self.fonts[(name, size)] = pygame.font.SysFont(name, size)
+        return font
+
+
+# fonts shared by the graph plotter, the textboxes and the profiler
+fonts = FontRegistry()
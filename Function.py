@@ -1,82 +1,246 @@
 import math
 import numpy
-import sympy
-from sympy.parsing.sympy_parser import parse_expr
+from time import perf_counter
+from itertools import count
 from functools import lru_cache
+from SampleCache import sample_cache
+from ExpressionCompiler import compile_native, might_be_constant
 from StringUtilities import add_missing_brackets, is_standalone, char_exists, char_equals
 
+# unique ids of functions, used as keys in the sample cache
+function_ids = count()
+
+# names of the functions that can be referenced by other functions
+FUNCTION_NAMES = "fghijklmno"
+
+# number of significant digits of precise evaluations
+PRECISE_DIGITS = 40
+
+# minimum number of x values of an evaluation that is used to measure the time per value
+MIN_COST_VALUES = 64
+
+# sympy and the modules built on it are imported by the functions that need them, so the program starts without waiting for them
+# they're imported when the first function that isn't empty is compiled
+
+# normalize function string so sympy can parse it, normalized strings are saved for retyped functions
+@lru_cache(maxsize=1024)
+def normalize_function(function):
+    # strip function of whitespace
+    function = function.strip()
+
+    # separate characters from numbers and brackets by multiplication, references to other functions stay calls
+    for i in range(len(function) - 1, -1, -1):
+        if function[i].isalpha() and function[i] not in FUNCTION_NAMES and is_standalone(function, i) and char_equals(function, i + 1, "("):
+            function = function[:i + 1] + "*" + function[i + 1:]
+        if (function[i] == ")" or function[i].isdigit()) and char_exists(function, i + 1) and (function[i + 1].isalpha() or function[i + 1] == "("):
+            function = function[:i + 1] + "*" + function[i + 1:]
+        if (function[i] == ")" and char_exists(function, i + 1) and function[i + 1].isdigit()):
+            function = function[:i + 1] + "*" + function[i + 1:]
+
+    # replace ^ in the function with **
+    function = function.replace("^", "**")
+
+    # replace backwards standalone es with exp(1) to avoid sympy confusing it with a variable
+    for i in range(len(function) - 1, -1, -1):
+        if function[i] == "e" and is_standalone(function, i):
+            function = function[:i] + "exp(1)" + function[i + 1:]
+
+    return function
+
+# compile normalized function string, returns function constant (if possible), function and sympy expression (if possible)
+# referenced functions are passed to the compiled function after x, in the order of names
+# compiled functions are saved for functions that are typed again, least recently used ones are removed first
+@lru_cache(maxsize=256)
+def compile_function(function, names=()):
+    # empty functions are invalid, they don't need sympy
+    if function == "":
+        return None, None, None
+
+    import sympy
+    from sympy.parsing.sympy_parser import parse_expr
+    from Calculus import lambdify_numeric
+    arguments = (sympy.symbols("x"),) + tuple(sympy.symbols(name) for name in names)
+    try:
+        # try to parse function with sympy, works for math operations
+        functionExpr = parse_expr(function, local_dict={name: sympy.Function(name) for name in names})
+
+        # resolve integrals and derivatives symbolically once, the ones that stay unresolved are evaluated numerically
+        try:
+            functionExpr = functionExpr.doit()
+        except:
+            pass
+
+        # check if function is a constant
+        try:
+            functionValue = float(functionExpr)
+            return functionValue, lambda x: functionValue, functionExpr
+        except:
+            # check if function contains an unknown symbol
+            if len(functionExpr.free_symbols) > 1 or len(functionExpr.free_symbols) == 1 and sympy.symbols("x") not in functionExpr.free_symbols:
+                return None, None, None
+            else:
+                # check if function is not an expression
+                if not isinstance(functionExpr, sympy.Expr):
+                    return None, None, None
+                else:
+                    compiled = lambdify_numeric(arguments, functionExpr)
+
+                    # expressions without x that sympy can't evaluate, like unresolved definite integrals, are constants of their numeric value
+                    if len(functionExpr.free_symbols) == 0 and len(names) == 0:
+                        try:
+                            with numpy.errstate(all="ignore"):
+                                functionValue = compiled(0.0)
+                            if numpy.ndim(functionValue) == 0 and numpy.isrealobj(functionValue) and numpy.isfinite(functionValue):
+                                functionValue = float(functionValue)
+                                return functionValue, lambda x: functionValue, functionExpr
+                        except:
+                            pass
+                    return None, compiled, functionExpr
+    except:
+        # try to parse function with lambdify, works for python expressions
+        try:
+            f = sympy.lambdify(arguments, function)
+
+            # check if function is a constant
+            if "x" not in function and len(names) == 0:
+                try:
+                    value = eval(function)
+                    if isinstance(value, (int, float)):
+                        return value, lambda x: value, None
+                    else:
+                        return None, None, None
+                except:
+                    return None, None, None
+            else:
+                return None, f, None
+        except:
+            return None, None, None
+
+# compile a simple function, so sympy is imported before the first function typed by the user is compiled
+def warm_up():
+    compile_function("x")
+
+# compile a derivative of a sympy expression, returns None if it can't be derived
+@lru_cache(maxsize=256)
+def compile_derivative(expression, order):
+    import sympy
+    from Calculus import lambdify_numeric
+    try:
+        return lambdify_numeric((sympy.symbols("x"),), sympy.diff(expression, sympy.symbols("x"), order))
+    except:
+        return None
+
+# compile a sympy expression to a function that evaluates it with mpmath, returns None if it can't be compiled
+@lru_cache(maxsize=256)
+def compile_precise(expression):
+    import sympy
+    try:
+        return sympy.lambdify(sympy.symbols("x"), expression, "mpmath")
+    except:
+        return None
+
+# compile the evaluation of a sympy expression on intervals, returns None if it can't be evaluated on intervals
+@lru_cache(maxsize=256)
+def compile_interval_function(expression):
+    from Interval import compile_interval
+    return compile_interval(expression)
+
 # class for functions
+# references are the functions this function calls, by their names
 class Function:
-    def __init__(self, string):
+    def __init__(self, string, references=None):
+        self.id = next(function_ids)
+        self.references = references or {}
+        self.full_expression = None
+
+        # number of x values the function was evaluated at since the count was last taken
+        self.evaluations = 0
+
+        # seconds the last big enough evaluation took per x value
+        self.cost = 0
+
+        # natively compiled functions are parsed with sympy when their expression is first needed
+        self.parsed = True
+
         if string == "Error":
-            self.string, self.value, self.function = "Error", None, None
+            self.string, self.value, self.function, self.expression = "Error", None, None, None
         else:
-            self.string, self.value, self.function = self.parse_function(
+            self.string, self.value, self.function, self.expression = self.parse_function(
                 string)
 
-    # parse function, returns function string, function constant (if possible), and function
+    # parse function, returns function string, function constant (if possible), function and sympy expression (if possible)
+    # parsed functions are shared by all functions with the same normalized string
+    # common expressions are compiled without sympy, other expressions and the sympy expressions of common ones are compiled with sympy
     def parse_function(self, function):
-        # strip function of whitespace
-        function = function.strip()
-
-        # separate characters from numbers and brackets by multiplication
-        for i in range(len(function) - 1, -1, -1):
-            if function[i].isalpha() and is_standalone(function, i) and char_equals(function, i + 1, "("):
-                function = function[:i + 1] + "*" + function[i + 1:]
-            if (function[i] == ")" or function[i].isdigit()) and char_exists(function, i + 1) and (function[i + 1].isalpha() or function[i + 1] == "("):
-                function = function[:i + 1] + "*" + function[i + 1:]
-            if (function[i] == ")" and char_exists(function, i + 1) and function[i + 1].isdigit()):
-                function = function[:i + 1] + "*" + function[i + 1:]
-
-        # replace ^ in the function with **
-        function = function.replace("^", "**")
-
-        # replace backwards standalone es with exp(1) to avoid sympy confusing it with a variable
-        for i in range(len(function) - 1, -1, -1):
-            if function[i] == "e" and is_standalone(function, i):
-                function = function[:i] + "exp(1)" + function[i + 1:]
+        names = tuple(sorted(self.references))
+        references = [self.references[name] for name in names]
+        native = compile_native(function, names)
+        if native is not None and len(names) > 0 and native[0] is None and might_be_constant(lambda x: native[1](x, *references)):
+            native = None
+        function = normalize_function(function)
+        if native is not None:
+            value, compiled, has_x = native
+            expression = None
+            self.parsed = False
+        else:
+            value, compiled, expression = compile_function(function, names)
+            has_x = expression is None or any(symbol.name == "x" for symbol in expression.free_symbols)
+        if len(names) == 0 or value is not None:
+            return function, value, compiled, expression
 
-        try:
-            # try to parse function with sympy, works for math operations
-            functionExpr = parse_expr(function)
+        # pass the referenced functions to the compiled function
+        if compiled is None:
+            return function, None, None, None
+        def evaluate(x): return compiled(x, *references)
 
-            # check if function is a constant
-            try:
-                functionValue = float(functionExpr)
-                return function, functionValue, lambda x: functionValue
-            except:
-                # check if function contains an unknown symbol
-                if len(functionExpr.free_symbols) > 1 or len(functionExpr.free_symbols) == 1 and sympy.symbols("x") not in functionExpr.free_symbols:
-                    return function, None, None
-                else:
-                    # check if function is not an expression
-                    if not isinstance(functionExpr, sympy.Expr):
-                        return function, None, None
-                    else:
-                        return function, None, sympy.lambdify(sympy.symbols("x"), functionExpr)
-        except:
-            # try to parse function with lambdify, works for python expressions
+        # functions that only call other functions with constants are constants as well
+        if not has_x:
             try:
-                f = sympy.lambdify(sympy.symbols("x"), function)
-
-                # check if function is a constant
-                if "x" not in function:
-                    try:
-                        value = eval(function)
-                        if isinstance(value, (int, float)):
-                            return function, value, lambda x: value
-                        else:
-                            return function, None, None
-                    except:
-                        return function, None, None
-                else:
-                    return function, None, f
+                value = float(evaluate(0.0))
+                if math.isfinite(value):
+                    return function, value, lambda x: value, expression
             except:
-                return function, None, None
+                pass
+        return function, None, evaluate, expression
+
+    # evaluate the function at a number or an array of numbers, used when other functions call this function
+    def __call__(self, x):
+        if numpy.ndim(x) == 0:
+            return float(self.get_values(x))
+        return self.get_values(x)
+
+    # return the sympy expression of the function, None if it isn't known
+    def get_expression(self):
+        if not self.parsed:
+            self.expression = compile_function(self.string, tuple(sorted(self.references)))[2]
+            self.parsed = True
+        return self.expression
+
+    # return if the sympy expressions of the function and of all functions it references were parsed
+    def is_parsed(self):
+        return self.parsed and all(function.is_parsed() for function in self.references.values())
+
+    # return the sympy expression with the expressions of referenced functions inserted, None if one isn't known
+    def get_full_expression(self):
+        if self.full_expression is None and self.get_expression() is not None:
+            import sympy
+            expression = self.expression
+            for name, function in self.references.items():
+                inserted = function.get_full_expression()
+                if inserted is None:
+                    return None
+                expression = expression.replace(sympy.Function(
+                    name), sympy.Lambda(sympy.symbols("x"), inserted))
+            self.full_expression = expression
+        return self.full_expression
 
     # function that returns the value of the function at a given x
-    @lru_cache(maxsize=20000)
     def get_value(self, x):
+        self.evaluations += 1
+        return self.compute_value(x)
+
+    # compute the value of the function at a given x, None if it's undefined
+    def compute_value(self, x):
         # if the function is a constant, return the constant
         if self.value != None:
             return self.value
@@ -84,7 +248,10 @@ class Function:
             # eval function
             try:
                 # if value is a float or int, return it
+                # numerically evaluated integrals return arrays without dimensions, real ones are used as floats
                 value = self.function(x)
+                if isinstance(value, (numpy.ndarray, numpy.generic)) and numpy.ndim(value) == 0 and numpy.isrealobj(value):
+                    value = float(value)
                 if (isinstance(value, float) or isinstance(value, int)) and not numpy.isnan(value):
                     return value
                 else:
@@ -92,10 +259,136 @@ class Function:
             except:
                 return None
 
+    # function that returns the values of the function at an array of x values, undefined values are nan
+    def get_values(self, xs):
+        xs = numpy.asarray(xs, dtype=float)
+        self.evaluations += xs.size
+
+        # if the function is a constant, return the constant for every x
+        if self.value != None:
+            return numpy.full(xs.shape, float(self.value))
+
+        # try to evaluate the whole array at once, works for numpy-compatible functions
+        start_time = perf_counter()
+        try:
+            with numpy.errstate(all="ignore"):
+                values = numpy.broadcast_to(self.function(xs), xs.shape)
+
+            # complex values are undefined
+            if numpy.iscomplexobj(values):
+                values = numpy.where(values.imag == 0, values.real, numpy.nan)
+            values = numpy.array(values, dtype=float)
+        except:
+            # evaluate every x on its own if the function doesn't support arrays
+            values = numpy.array([numpy.nan if y is None else y for y in map(
+                self.compute_value, xs.tolist())], dtype=float)
+
+        if xs.size >= MIN_COST_VALUES:
+            self.cost = (perf_counter() - start_time) / xs.size
+
+        # infinite values are undefined as well
+        values[~numpy.isfinite(values)] = numpy.nan
+        return values
+
+    # function that returns the values of the function at an array of x values evaluated with mpmath, undefined values are nan
+    # the values are exact up to float rounding even where float evaluation loses digits, functions without a sympy expression are evaluated as floats
+    def get_precise_values(self, xs):
+        xs = numpy.asarray(xs, dtype=float)
+        expression = self.get_full_expression()
+        evaluate = compile_precise(expression) if expression is not None else None
+        if self.value != None or evaluate is None:
+            return self.get_values(xs)
+
+        import mpmath
+        self.evaluations += xs.size
+        values = numpy.full(xs.size, numpy.nan)
+        with mpmath.workdps(PRECISE_DIGITS):
+            for i, x in enumerate(xs.ravel().tolist()):
+                try:
+                    value = evaluate(mpmath.mpf(x))
+
+                    # complex values are undefined
+                    if isinstance(value, mpmath.mpc):
+                        value = value.real if value.imag == 0 else numpy.nan
+                    values[i] = float(value)
+                except:
+                    pass
+
+        # infinite values are undefined as well
+        values[~numpy.isfinite(values)] = numpy.nan
+        return values.reshape(xs.shape)
+
+    # function that returns x and y values between min_x and max_x with a spacing of at most step, values are cached in tiles
+    # if y_scale (pixels per unit) is given, the samples are refined where the curve bends and nan is inserted at jumps
+    # if precise is set, the values are evaluated with get_precise_values
+    def get_samples(self, min_x, max_x, step, y_scale=None, precise=False):
+        return sample_cache.get_samples(self, min_x, max_x, step, y_scale, precise)
+
+    # function that returns the start x of pixel columns between min_x and max_x and the lowest and highest value in every column
+    # every column is evaluated at several points, so functions that oscillate faster than the pixels are shown correctly
+    def get_envelope(self, min_x, max_x, pixel):
+        return sample_cache.get_envelope(self, min_x, max_x, pixel)
+
+    # function that returns the values of a derivative of the function at an array of x values, nan where it's undefined or unknown
+    def get_derivative_values(self, xs, order=1):
+        xs = numpy.asarray(xs, dtype=float)
+        expression = self.get_full_expression()
+        if expression is None:
+            return numpy.full(xs.shape, numpy.nan)
+
+        # derive the expression symbolically the first time the derivative is needed
+        derivative = compile_derivative(expression, order)
+        if derivative is None:
+            return numpy.full(xs.shape, numpy.nan)
+
+        try:
+            with numpy.errstate(all="ignore"):
+                values = numpy.array(numpy.broadcast_to(derivative(xs), xs.shape), dtype=float)
+        except:
+            return numpy.full(xs.shape, numpy.nan)
+
+        values[~numpy.isfinite(values)] = numpy.nan
+        return values
+
+    # function that returns a lower and an upper bound of the function on every interval from lows to highs
+    # the bounds are -inf and inf where they're unknown and nan where the function is undefined on the whole interval
+    def get_intervals(self, lows, highs):
+        lows = numpy.asarray(lows, dtype=float)
+        highs = numpy.asarray(highs, dtype=float)
+        if self.value != None:
+            return numpy.full(lows.shape, float(self.value)), numpy.full(lows.shape, float(self.value))
+
+        if self.has_intervals():
+            try:
+                with numpy.errstate(all="ignore"):
+                    return compile_interval_function(self.expression)(lows, highs, self.references)
+            except:
+                pass
+        return numpy.full(lows.shape, -numpy.inf), numpy.full(lows.shape, numpy.inf)
+
+    # return if the function and all functions it references can be evaluated on intervals
+    # natively compiled functions can be evaluated on intervals once their sympy expression was parsed, the graph plotter doesn't wait for it
+    def has_intervals(self):
+        if self.value != None:
+            return True
+        if self.expression is None or compile_interval_function(self.expression) is None:
+            return False
+        return all(function.has_intervals() for function in self.references.values())
+
     # return if function is valid
     def is_valid(self):
         return self.function is not None
 
-    # print cache info
-    def print_cache_info(self):
-        print(self.get_value.cache_info())
+    # remove the cached samples of the function
+    def clear_cache(self):
+        sample_cache.discard(self)
+
+    # return number of cached tiles, tile hits, tile misses and bytes used
+    def get_cache_info(self):
+        return sample_cache.get_info(self)
+
+    # return the number of evaluations since the last call
+    def take_evaluations(self):
+        evaluations = self.evaluations
+        self.evaluations = 0
+        return evaluations
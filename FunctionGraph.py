@@ -0,0 +1,78 @@
+from Function import Function, FUNCTION_NAMES
+from StringUtilities import add_missing_brackets, is_standalone, char_equals
+
+# class for the functions typed by the user and the references between them
+# functions call the compiled functions they reference, so a change only recompiles the changed function and the functions depending on it
+class FunctionGraph:
+    def __init__(self, functions):
+        self.functions = list(functions)
+        self.texts = ["" for function in functions]
+
+        # indices of the functions every function references
+        self.references = [set() for function in functions]
+
+    # get the indices of the functions referenced in a text
+    def get_references(self, text):
+        references = set()
+        for i in range(len(text)):
+            if text[i] in FUNCTION_NAMES and is_standalone(text, i) and char_equals(text, i + 1, "("):
+                references.add(FUNCTION_NAMES.index(text[i]))
+        return references
+
+    # get the indices of the functions that reference a function
+    def get_dependents(self, index):
+        return [i for i in range(len(self.functions)) if index in self.references[i]]
+
+    # change the text of a function, returns the indices of all recompiled functions
+    def set_text(self, index, text):
+        self.texts[index] = add_missing_brackets(text)
+        self.references[index] = self.get_references(self.texts[index])
+
+        # the changed function and all functions depending on it have to be recompiled
+        changed = {index}
+        stack = [index]
+        while len(stack) > 0:
+            for f in self.get_dependents(stack.pop()):
+                if f not in changed:
+                    changed.add(f)
+                    stack.append(f)
+
+        self.compile_changed(changed)
+        return changed
+
+    # change the texts of all functions at once, every function is compiled only once, returns the indices of all functions
+    def set_texts(self, texts):
+        for index, text in enumerate(texts):
+            self.texts[index] = add_missing_brackets(text)
+            self.references[index] = self.get_references(self.texts[index])
+
+        changed = set(range(len(self.functions)))
+        self.compile_changed(changed)
+        return changed
+
+    # compile a set of changed functions
+    def compile_changed(self, changed):
+        # compile functions after the functions they reference (topological order)
+        # functions that are left over are part of a cycle or depend on one
+        remaining = {f: len(self.references[f] & changed) for f in changed}
+        ready = [f for f in changed if remaining[f] == 0]
+        while len(ready) > 0:
+            f = ready.pop()
+            self.compile(f)
+            del remaining[f]
+            for dependent in self.get_dependents(f):
+                if dependent in remaining:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        ready.append(dependent)
+
+        for f in remaining:
+            self.functions[f] = Function("Error")
+
+    # compile a function, functions referencing invalid functions are invalid as well
+    def compile(self, index):
+        references = {FUNCTION_NAMES[f]: self.functions[f] for f in self.references[index]}
+        if all(function.is_valid() for function in references.values()):
+            self.functions[index] = Function(self.texts[index], references)
+        else:
+            self.functions[index] = Function("Error")
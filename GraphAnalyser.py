@@ -0,0 +1,479 @@
+import math
+import numpy
+import threading
+from time import perf_counter
+from queue import Queue, Empty
+from AdaptiveSampler import are_continuous
+from Point import Point
+
+# maximum number of iterations to refine zeros, intersections and extrema
+MAX_ITERATIONS = 100
+
+# maximum number of times a step is halved to isolate roots, and maximum number of intervals that are halved at once
+ISOLATION_DEPTH = 10
+MAX_ISOLATION_INTERVALS = 4096
+
+# class for an analysis of all graphs for zeros, maximums, minimums and intersections
+# works on a snapshot of the functions and the screen, so it can run on the analysis worker
+class Analysis:
+    # expensive functions are evaluated in parallel on the evaluation pool if one is given
+    def __init__(self, functions, min_x, max_x, min_y, max_y, height, start=None, end=None, evaluation_pool=None):
+        self.functions = list(functions)
+        self.min_x = min_x
+        self.max_x = max_x
+        self.min_y = min_y
+        self.max_y = max_y
+        self.height = height
+        self.evaluation_pool = evaluation_pool
+
+        # if start and end are not set, set them to the whole graph and replace all special points when done
+        self.is_full = start is None
+        self.start = min_x if start is None else start
+        self.end = max_x if start is None else end
+
+        # set by the analysis worker, analyses with an older generation are cancelled
+        self.generation = 0
+
+        self.special_points = []
+
+        # number of refined brackets, refinement iterations, function evaluations and interval evaluations, time the analysis took in seconds
+        self.statistics = {"brackets": 0, "iterations": 0, "evaluations": 0, "intervals": 0, "time": 0}
+
+    # run the analysis, returns False if it was cancelled
+    def run(self, is_cancelled):
+        start_time = perf_counter()
+
+        # parse the sympy expressions of natively compiled functions here instead of while drawing, they're needed for intervals and derivatives
+        for function in self.functions:
+            if function.is_valid():
+                function.get_full_expression()
+
+        # sensitivity for root finding
+        sensitivity = 1000000
+
+        # step through x-values, the first step is a test step that only provides the values before start
+        step_size = (self.max_x - self.min_x) / 100
+        tolerance = step_size / sensitivity
+        xs = numpy.arange(self.start - step_size, self.end, step_size)
+
+        # convert units to pixels to detect discontinuities
+        y_scale = self.height / (self.max_y - self.min_y)
+
+        # evaluate all functions at all steps at once, one row per function
+        values = self.evaluate_all(xs)
+
+        # found special points as step, function index, description and x value
+        candidates = []
+
+        # search for zeros: exact zeros and sign changes between two steps
+        for i, k in zip(*numpy.nonzero(values[:, 1:] == 0)):
+            candidates.append((k + 1, i, "Zero", xs[k + 1]))
+
+        indices, steps = numpy.nonzero(numpy.sign(values[:, 1:]) * numpy.sign(values[:, :-1]) < 0)
+        brackets = (indices, numpy.full(len(indices), -1), steps, xs[steps], xs[steps + 1])
+
+        # steps without a sign change can still contain roots that are close together or touch zero
+        same_indices, same_steps = numpy.nonzero(numpy.sign(values[:, 1:]) * numpy.sign(values[:, :-1]) > 0)
+        isolated, touching = self.isolate_roots(same_indices, numpy.full(len(same_indices), -1), same_steps, xs[same_steps], xs[same_steps + 1],
+                                                values[same_indices, same_steps], values[same_indices, same_steps + 1])
+        indices, others, steps, a, b = [numpy.concatenate(arrays) for arrays in zip(brackets, isolated)]
+
+        roots = self.find_roots(indices, others, a, b, tolerance, y_scale)
+        for i, k, root in zip(indices, steps, roots):
+            if not numpy.isnan(root):
+                candidates.append((k + 1, i, "Zero", root))
+
+        # touching points are only added if the extrema don't contain them already
+        touching_candidates = []
+        for i, j, k, a, b, x in zip(*touching, self.find_touching_roots(*touching, tolerance, y_scale)):
+            if not numpy.isnan(x):
+                touching_candidates.append((k + 1, i, "Zero", x, a, b))
+
+        if is_cancelled():
+            return False
+
+        # search for intersections: exact equalities and sign changes of the differences of every pair of functions
+        pairs_i, pairs_j = numpy.triu_indices(len(self.functions), 1)
+        differences = values[pairs_i] - values[pairs_j]
+
+        for pair, k in zip(*numpy.nonzero(differences[:, 1:] == 0)):
+            candidates.append((k + 1, pairs_i[pair], "Intersection", xs[k + 1]))
+            candidates.append((k + 1, pairs_j[pair], "Intersection", xs[k + 1]))
+
+        pairs, steps = numpy.nonzero(numpy.sign(differences[:, 1:]) * numpy.sign(differences[:, :-1]) < 0)
+        brackets = (pairs_i[pairs], pairs_j[pairs], steps, xs[steps], xs[steps + 1])
+
+        # steps without a sign change can still contain intersections that are close together or touching graphs
+        same_pairs, same_steps = numpy.nonzero(numpy.sign(differences[:, 1:]) * numpy.sign(differences[:, :-1]) > 0)
+        isolated, touching = self.isolate_roots(pairs_i[same_pairs], pairs_j[same_pairs], same_steps, xs[same_steps], xs[same_steps + 1],
+                                                differences[same_pairs, same_steps], differences[same_pairs, same_steps + 1])
+        indices, others, steps, a, b = [numpy.concatenate(arrays) for arrays in zip(brackets, isolated)]
+
+        roots = self.find_roots(indices, others, a, b, tolerance, y_scale)
+        for i, j, k, root in zip(indices, others, steps, roots):
+            if not numpy.isnan(root):
+                candidates.append((k + 1, i, "Intersection", root))
+                candidates.append((k + 1, j, "Intersection", root))
+
+        for i, j, k, a, b, x in zip(*touching, self.find_touching_roots(*touching, tolerance, y_scale)):
+            if not numpy.isnan(x):
+                touching_candidates.append((k + 1, i, "Intersection", x, a, b))
+                touching_candidates.append((k + 1, j, "Intersection", x, a, b))
+
+        if is_cancelled():
+            return False
+
+        # search for maximums and minimums: sign changes of the slope between two steps
+        slopes = numpy.sign(numpy.diff(values, axis=1))
+        indices, steps = numpy.nonzero(slopes[:, 1:] * slopes[:, :-1] < 0)
+        signs = slopes[indices, steps]
+        extrema = self.find_extrema(indices, signs, xs[steps], xs[steps + 2], tolerance, y_scale)
+
+        # check if extrema are zeros or intersections as well
+        extrema_values = numpy.array([f.get_values(extrema) if f.is_valid() else numpy.full(len(extrema), numpy.nan)
+                                      for f in self.functions]).reshape(len(self.functions), len(extrema))
+        for e in range(len(extrema)):
+            if numpy.isnan(extrema[e]):
+                continue
+
+            i = indices[e]
+            k = steps[e] + 2
+            candidates.append((k, i, "Maximum" if signs[e] == 1 else "Minimum", extrema[e]))
+
+            # if value is close enough to zero, save it as a zero
+            extr_y = extrema_values[i, e]
+            if abs(extr_y) < tolerance * 100:
+                candidates.append((k, i, "Zero", extrema[e]))
+
+            # if value is close enough to another value, save it as an intersection
+            for j in numpy.flatnonzero(numpy.abs(extrema_values[:, e] - extr_y) < tolerance * 100):
+                if j != i:
+                    candidates.append((k, i, "Intersection", extrema[e]))
+                    candidates.append((k, j, "Intersection", extrema[e]))
+
+        for k, i, description, x, a, b in touching_candidates:
+            if not any(c[1] == i and c[2] == description and a <= c[3] <= b for c in candidates):
+                candidates.append((k, i, description, x))
+
+        # add points step by step, points that were already found in the step before are skipped
+        found = {}
+        for k, i, description, x in sorted(candidates, key=lambda c: c[0]):
+            self.add_special_point(x, int(i), description, tolerance * 2, found.get(k - 1, []))
+            found.setdefault(k, []).append([i, description])
+
+        # check for y-intercepts
+        for i in range(len(self.functions)):
+            if self.functions[i].get_value(0) is not None:
+                self.add_special_point(
+                    0, i, "Y-Intercept", tolerance * 2, [])
+
+        self.statistics["time"] = perf_counter() - start_time
+        return True
+
+    # evaluate the function with the index minus the function with the other index at every x value, if other is -1, nothing is subtracted
+    # order > 0 evaluates derivatives instead
+    def evaluate_differences(self, indices, others, xs, order=0):
+        results = numpy.zeros(len(xs))
+        for index in numpy.unique(indices):
+            mask = indices == index
+            results[mask] = self.evaluate(index, xs[mask], order)
+        for other in numpy.unique(others[others >= 0]):
+            mask = others == other
+            results[mask] -= self.evaluate(other, xs[mask], order)
+        return results
+
+    # evaluate all valid functions at the x values, one row per function, nan for invalid functions
+    # functions that take long enough are evaluated in parallel on the evaluation pool
+    def evaluate_all(self, xs):
+        values = numpy.full((len(self.functions), len(xs)), numpy.nan)
+        parallel = []
+        for i in range(len(self.functions)):
+            if self.functions[i].is_valid():
+                if self.evaluation_pool is not None and self.evaluation_pool.is_worth(self.functions[i], len(xs)):
+                    parallel.append(i)
+                else:
+                    values[i] = self.evaluate(i, xs)
+
+        if len(parallel) > 0:
+            self.statistics["evaluations"] += len(xs) * len(parallel)
+            results = self.evaluation_pool.evaluate([(i, self.functions[i], xs, False) for i in parallel])
+            for i, result in zip(parallel, results):
+                values[i] = result
+        return values
+
+    # evaluate a function or its derivative and count the evaluations
+    def evaluate(self, index, xs, order=0):
+        self.statistics["evaluations"] += len(xs)
+        if order == 0:
+            return self.functions[index].get_values(xs)
+        else:
+            return self.functions[index].get_derivative_values(xs, order)
+
+    # evaluate the function with the index minus the function with the other index on the intervals from a to b, returns lower and upper bounds
+    def evaluate_difference_intervals(self, indices, others, a, b):
+        lows = numpy.zeros(len(a))
+        highs = numpy.zeros(len(a))
+        for index in numpy.unique(indices):
+            mask = indices == index
+            self.statistics["intervals"] += numpy.count_nonzero(mask)
+            function_lows, function_highs = self.functions[index].get_intervals(a[mask], b[mask])
+            lows[mask] += function_lows
+            highs[mask] += function_highs
+        for other in numpy.unique(others[others >= 0]):
+            mask = others == other
+            self.statistics["intervals"] += numpy.count_nonzero(mask)
+            function_lows, function_highs = self.functions[other].get_intervals(a[mask], b[mask])
+            lows[mask] -= function_highs
+            highs[mask] -= function_lows
+        return lows, highs
+
+    # isolate the roots of the differences in the steps from a to b whose values fa and fb have the same sign
+    # the steps are halved until evaluating the differences on intervals proves there's no root or the values at the ends have different signs
+    # returns the brackets with different signs and the smallest intervals that still can touch zero, grouped by step
+    # both as function indices, other indices, steps, starts and ends
+    def isolate_roots(self, indices, others, steps, a, b, fa, fb):
+        # only functions that can be evaluated on intervals can be isolated
+        supported = numpy.array([f.is_valid() and f.has_intervals() for f in self.functions])
+        keep = supported[indices] & ((others < 0) | supported[numpy.maximum(others, 0)])
+        intervals = [array[keep] for array in (indices, others, steps, a, b, fa, fb)]
+
+        brackets = [[array[:0]] for array in intervals[:5]]
+        for depth in range(ISOLATION_DEPTH + 1):
+            if len(intervals[0]) == 0:
+                break
+
+            # keep the intervals that can contain a root
+            lows, highs = self.evaluate_difference_intervals(*intervals[:2], *intervals[3:5])
+            intervals = [array[(lows <= 0) & (highs >= 0)] for array in intervals]
+            if depth == ISOLATION_DEPTH or len(intervals[0]) > MAX_ISOLATION_INTERVALS:
+                break
+
+            # halve the intervals, halves with a sign change or a root at the end are brackets, halves with the same sign are halved again
+            indices, others, steps, a, b, fa, fb = intervals
+            middle = (a + b) / 2
+            f_middle = self.evaluate_differences(indices, others, middle)
+            intervals = [numpy.concatenate(halves) for halves in zip(
+                (indices, others, steps, a, middle, fa, f_middle), (indices, others, steps, middle, b, f_middle, fb))]
+            signs = numpy.sign(intervals[5]) * numpy.sign(intervals[6])
+            is_bracket = (signs < 0) | (intervals[6] == 0)
+            for bracket, array in zip(brackets, intervals[:5]):
+                bracket.append(array[is_bracket])
+            intervals = [array[signs > 0] for array in intervals]
+
+        # join the remaining intervals of every step and difference
+        touching = {}
+        for i, j, k, start, end in zip(*[array.tolist() for array in intervals[:5]]):
+            key = (i, j, k)
+            old_start, old_end = touching.get(key, (start, end))
+            touching[key] = (min(start, old_start), max(end, old_end))
+        touching = [numpy.array([key[n] for key in touching], dtype=int) for n in range(3)] + \
+                   [numpy.array([value[n] for value in touching.values()], dtype=float) for n in range(2)]
+
+        return [numpy.concatenate(bracket) for bracket in brackets], touching
+
+    # find the roots where the differences touch zero without changing their sign between a and b, returns nan where there's none
+    # a touching root is an extremum of the difference whose value is close enough to zero
+    def find_touching_roots(self, indices, others, steps, a, b, tolerance, y_scale):
+        if len(a) == 0:
+            return numpy.empty(0)
+
+        # positive differences touch zero with a minimum, negative ones with a maximum
+        signs = -numpy.sign(self.evaluate_differences(indices, others, (a + b) / 2))
+        extrema = self.find_extrema(indices, signs, a, b, tolerance, y_scale, others)
+        values = self.evaluate_differences(indices, others, numpy.nan_to_num(extrema))
+        return numpy.where(numpy.abs(values) < tolerance * 100, extrema, numpy.nan)
+
+    # find the roots of the differences in the brackets from a to b, returns nan where there's no root
+    def find_roots(self, indices, others, a, b, tolerance, y_scale):
+        def evaluate(brackets, xs, order=0):
+            return self.evaluate_differences(indices[brackets], others[brackets], xs, order)
+
+        # skip sign changes at poles and jumps of either function
+        continuous = are_continuous(evaluate, a, b, y_scale)
+
+        roots = numpy.full(len(a), numpy.nan)
+        brackets = numpy.flatnonzero(continuous)
+        roots[brackets] = self.refine_roots(lambda ids, xs: evaluate(brackets[ids], xs), lambda ids, xs: evaluate(
+            brackets[ids], xs, 1), a[brackets], b[brackets], tolerance)
+        return roots
+
+    # find the roots in the brackets from a to b, the values at a and b must have different signs, returns nan where no root was found
+    # uses Newton's method where the derivative is known and the Illinois method where it isn't, steps that leave the bracket are replaced by bisection
+    def refine_roots(self, evaluate, derivative, a, b, tolerance):
+        brackets = numpy.arange(len(a))
+        a = a.copy()
+        b = b.copy()
+        fa = evaluate(brackets, a)
+        fb = evaluate(brackets, b)
+        x = (a + b) / 2
+        roots = numpy.full(len(a), numpy.nan)
+        self.statistics["brackets"] += len(a)
+
+        # save which side of the bracket was moved last, 1 for a and -1 for b
+        last_side = numpy.zeros(len(a))
+
+        active = ~numpy.isnan(fa) & ~numpy.isnan(fb)
+        for iteration in range(MAX_ITERATIONS):
+            ids = numpy.flatnonzero(active)
+            if len(ids) == 0:
+                break
+            self.statistics["iterations"] += len(ids)
+
+            fx = evaluate(ids, x[ids])
+            dfx = derivative(ids, x[ids])
+
+            # stop where the function is undefined or the root was hit exactly
+            active[ids[numpy.isnan(fx)]] = False
+            zero = fx == 0
+            roots[ids[zero]] = x[ids[zero]]
+            active[ids[zero]] = False
+
+            # move the side of the bracket with the same sign to x
+            side = numpy.where(numpy.sign(fx) == numpy.sign(fa[ids]), 1, -1)
+            a[ids] = numpy.where(side == 1, x[ids], a[ids])
+            fa[ids] = numpy.where(side == 1, fx, fa[ids])
+            b[ids] = numpy.where(side == -1, x[ids], b[ids])
+            fb[ids] = numpy.where(side == -1, fx, fb[ids])
+
+            # if the same side was moved twice, halve the value of the other side so the secant doesn't get stuck
+            fb[ids] = numpy.where((side == 1) & (last_side[ids] == 1), fb[ids] / 2, fb[ids])
+            fa[ids] = numpy.where((side == -1) & (last_side[ids] == -1), fa[ids] / 2, fa[ids])
+            last_side[ids] = side
+
+            # next x with Newton's method or the secant through both sides of the bracket, bisection if it leaves the bracket
+            with numpy.errstate(all="ignore"):
+                newton = x[ids] - fx / dfx
+                secant = (a[ids] * fb[ids] - b[ids] * fa[ids]) / (fb[ids] - fa[ids])
+            new_x = numpy.where(numpy.isfinite(newton), newton, secant)
+            inside = (new_x > a[ids]) & (new_x < b[ids])
+            new_x = numpy.where(inside, new_x, (a[ids] + b[ids]) / 2)
+
+            # stop when x doesn't move anymore or the bracket is small enough
+            converged = active[ids] & ((numpy.abs(new_x - x[ids]) < tolerance) | (b[ids] - a[ids] < tolerance))
+            roots[ids[converged]] = new_x[converged]
+            active[ids[converged]] = False
+            x[ids] = new_x
+
+        return roots
+
+    # find the maximums (sign 1) and minimums (sign -1) of the functions between a and b, returns nan where there's none
+    # if others are given, the extrema of the differences to the other functions are found
+    def find_extrema(self, indices, signs, a, b, tolerance, y_scale, others=None):
+        if others is None:
+            others = numpy.full(len(indices), -1)
+
+        def evaluate(brackets, xs, order=0):
+            return self.evaluate_differences(indices[brackets], others[brackets], xs, order)
+
+        # skip changes of the slope at poles and jumps
+        continuous = are_continuous(evaluate, a, b, y_scale)
+        extrema = numpy.full(len(a), numpy.nan)
+
+        # find roots of the derivative where it's known and changes its sign
+        brackets = numpy.arange(len(a))
+        newton = continuous & (numpy.sign(evaluate(brackets, a, 1)) * numpy.sign(evaluate(brackets, b, 1)) < 0)
+        brackets = numpy.flatnonzero(newton)
+        extrema[brackets] = self.refine_roots(lambda ids, xs: evaluate(brackets[ids], xs, 1), lambda ids, xs: evaluate(
+            brackets[ids], xs, 2), a[brackets], b[brackets], tolerance)
+
+        # golden-section search on all other brackets at once, so that (b - c) / (c - a) = gr
+        brackets = numpy.flatnonzero(continuous & ~newton)
+        a = a[brackets]
+        b = b[brackets]
+        gr = (1 + math.sqrt(5)) / 2
+        broken = numpy.zeros(len(a), dtype=bool)
+        self.statistics["brackets"] += len(a)
+        for iteration in range(MAX_ITERATIONS):
+            if len(a) == 0 or numpy.max(b - a) <= tolerance:
+                break
+            self.statistics["iterations"] += len(a)
+
+            c = (gr * a + b) / (1 + gr)
+            d = a + b - c
+            cy = evaluate(brackets, c)
+            dy = evaluate(brackets, d)
+            broken |= numpy.isnan(cy) | numpy.isnan(dy)
+
+            # stop where both values are equal, else keep the side of the extremum
+            direction = numpy.sign(dy - cy)
+            equal = direction == 0
+            middle = (a + b) / 2
+            a = numpy.where(equal, middle, numpy.where(direction == signs[brackets], c, a))
+            b = numpy.where(equal, middle, numpy.where(direction == signs[brackets], b, d))
+
+        extrema[brackets] = numpy.where(broken, numpy.nan, (a + b) / 2)
+        return extrema
+
+    # add special point to list
+    def add_special_point(self, x, index, description, sensitivity, last_special_points):
+        # check if point is already in list
+        for p in last_special_points:
+            if p[0] == index and p[1] == description:
+                return
+
+        # round x to two digits above sensitivity
+        x = round(x, -math.ceil(math.log10(sensitivity)) - 1)
+
+        for p in self.special_points:
+            if p.add_point(x, index, description):
+                return
+
+        if description == "Zero":
+            y = 0
+        else:
+            y = self.functions[index].get_value(x)
+            if y is None:
+                return
+            y = round(y, -math.ceil(math.log10(sensitivity)) - 1)
+
+        self.special_points.append(Point(x, y, index, description))
+
+# class for a background thread that runs analyses one after another
+class AnalysisWorker:
+    def __init__(self):
+        self.jobs = Queue()
+        self.results = Queue()
+
+        # generation of the newest analysis of the whole graph
+        self.generation = 0
+
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    # add analysis to the queue, an analysis of the whole graph cancels all older analyses
+    def submit(self, analysis):
+        if analysis.is_full:
+            self.generation += 1
+        analysis.generation = self.generation
+        self.jobs.put(analysis)
+
+    # check if an analysis was replaced by a newer one
+    def is_cancelled(self, analysis):
+        return analysis.generation < self.generation
+
+    # run analyses from the queue and save the finished ones
+    def work(self):
+        while True:
+            analysis = self.jobs.get()
+            try:
+                if not self.is_cancelled(analysis) and analysis.run(lambda: self.is_cancelled(analysis)):
+                    self.results.put(analysis)
+            except Exception as exception:
+                print("Analysis failed:", exception)
+            finally:
+                self.jobs.task_done()
+
+    # return finished analyses that are still up to date
+    def get_results(self):
+        results = []
+        while True:
+            try:
+                analysis = self.results.get_nowait()
+            except Empty:
+                return results
+            if not self.is_cancelled(analysis):
+                results.append(analysis)
+
+    # wait until all analyses in the queue are finished
+    def wait(self):
+        self.jobs.join()
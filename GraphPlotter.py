@@ -4,12 +4,38 @@ import math
 import numpy
 from time import time
 from Function import Function
+from SampleCache import sample_cache, TILE_SIZE
+from GraphAnalyser import Analysis, AnalysisWorker
+from PointIndex import PointIndex
+from Profiler import Profiler
+from Fonts import fonts
 from StringUtilities import *
 
+# number of intervals the visible x range is split into to skip the parts where a graph is outside the screen
+CULL_INTERVALS = 64
+
+# graphs are evaluated with mpmath if a pixel is smaller than this fraction of the coordinates on the screen, float rounding errors become visible there
+PRECISE_RESOLUTION = 1e-11
+
+# minimum number of floats per pixel between the borders of the screen, the screen can't be zoomed in further
+MIN_FLOATS_PER_PIXEL = 4
+
+# graphs that turn at more than this fraction of their samples oscillate too fast for a line and are drawn as an envelope
+# the turns are counted with this many samples per pixel in windows of DENSE_WINDOW pixels, a graph is dense if it's dense in any window
+DENSE_TURNS = 0.25
+DENSE_SAMPLES_PER_PIXEL = 2
+DENSE_WINDOW = 8
+
+# return where the samples turn, for every sample except the first and the last if the graph goes up before and down after it or the other way round
+def get_turns(ys):
+    slopes = numpy.sign(numpy.diff(ys))
+    return slopes[1:] * slopes[:-1] < 0
+
 # class for graph plotter
 class GraphPlotter:
     # clean function up upon initialization
-    def __init__(self, screen, width, height):
+    # expensive functions are evaluated in parallel on the evaluation pool if one is given
+    def __init__(self, screen, width, height, evaluation_pool=None):
         # set screen
         self.screen = screen
         self.width = width
@@ -38,23 +64,76 @@ class GraphPlotter:
         self.colors = [(255, 0, 0), (0, 0, 255), (0, 255, 0), (255, 165, 0), (0, 255, 255),
                        (255, 0, 255), (165, 42, 42), (255, 255, 0), (128, 0, 128), (255, 215, 0)]
 
-        # set font
-        self.small_font = pygame.font.SysFont("Arial", 12)
-        self.large_font = pygame.font.SysFont("Arial", 16)
+        # rendered axis numbers, saved by their string
+        self.labels = {}
+
+        # layer with the grid lines, reused while the screen is moved
+        self.grid_layer = None
+        self.grid_layer_unit = None
+        self.grid_layer_scale = None
+        self.grid_layer_min_x = None
+        self.grid_layer_max_y = None
+
+        self.special_points = PointIndex()
+
+        # analyse graphs on a background thread, save the statistics of the last analysis
+        self.analysis_worker = AnalysisWorker()
+        self.analysis_statistics = None
+
+        # draw graphs with anti-aliasing
+        self.anti_aliasing = False
+
+        # measure the time of drawing the grid and every function
+        self.profiler = Profiler()
+
+        self.evaluation_pool = evaluation_pool
 
-        self.special_points = []
+        # layer with the graphs revealed by the animation so far, the screen and functions it was drawn for and the x it was drawn up to
+        self.animation_layer = None
+        self.animation_key = None
+        self.animation_drawn_x = None
+
+        # if the graphs on the animation layer are drawn as envelopes, checked once for the whole screen
+        self.animation_dense = None
 
     # replace function in list
     def replace_function(self, string, index):
-        self.functions[index] = Function(string)
+        self.set_function(Function(string), index)
+
+    # replace function in list with an already parsed function
+    def set_function(self, function, index):
+        if function is not self.functions[index]:
+            self.functions[index].clear_cache()
+            self.functions[index] = function
+
+            # the workers of the evaluation pool only compile the changed function and the functions depending on it
+            if self.evaluation_pool is not None:
+                self.evaluation_pool.set_function(index, function)
 
     def map_value(self, value, low1, high1, low2, high2):
         return low2 + (value - low1) * (high2 - low2) / (high1 - low1)
 
+    # return the smallest distance between two floats at the coordinates of the screen
+    def get_float_spacing(self, low, high):
+        return max(numpy.spacing(max(abs(low), abs(high))), 1e-300)
+
+    # return if the graphs have to be evaluated precisely because float rounding errors would be visible
+    def needs_precision(self):
+        pixel_x = (self.max_x - self.min_x) / self.width
+        pixel_y = (self.max_y - self.min_y) / self.height
+        return pixel_x < PRECISE_RESOLUTION * max(abs(self.min_x), abs(self.max_x)) or \
+            pixel_y < PRECISE_RESOLUTION * max(abs(self.min_y), abs(self.max_y))
+
+    # return if a graph is evaluated precisely, natively compiled functions are evaluated with floats until the analysis parsed them with sympy
+    # so drawing never waits for sympy
+    def is_precise(self, index):
+        return self.needs_precision() and self.functions[index].is_parsed()
+
     # function to zoom in
     def zoom_in(self, pos):
-        # if zoom limit of 0.00000001 is reached, return
-        if (self.max_x - self.min_x) < 0.00000001 or (self.max_y - self.min_y) < 0.00000001:
+        # if the pixels get too small to be told apart by floats, return
+        if (self.max_x - self.min_x) < self.get_float_spacing(self.min_x, self.max_x) * self.width * MIN_FLOATS_PER_PIXEL or \
+                (self.max_y - self.min_y) < self.get_float_spacing(self.min_y, self.max_y) * self.height * MIN_FLOATS_PER_PIXEL:
             return
 
         self.zoom(pos, -self.zoom_speed * (self.max_x - self.min_x), -
@@ -101,6 +180,14 @@ class GraphPlotter:
             self.analyse_graphs(self.min_x, old_min_x)
             self.analyse_graphs(old_max_x, self.max_x)
 
+    # show the given range of units on the screen
+    def set_view(self, min_x, max_x, min_y, max_y):
+        self.min_x = min_x
+        self.max_x = max_x
+        self.min_y = min_y
+        self.max_y = max_y
+        self.animation_x = self.max_x
+
     # move screen
     def move(self, rel):
         # calculate dragged distance to units
@@ -139,12 +226,8 @@ class GraphPlotter:
         self.width = size[0]
         self.height = size[1]
 
-    # function that draws the grid
-    def draw_grid(self):
-        # fill screen white
-        self.screen.fill((255, 255, 255))
-
-        # get biggest grid unit that starts with 1, 2, 5, that is smaller than 100 pixels
+    # function that returns the biggest grid unit that starts with 1, 2, 5, that is smaller than 100 pixels, its power of ten and 100 pixels in units
+    def get_grid_unit(self):
         limit = self.map_value(100, 0, self.width, 0, self.max_x - self.min_x)
         grid_unit = 1
         power = 0
@@ -164,45 +247,25 @@ class GraphPlotter:
         else:
             grid_unit *= 5
 
-        # calculate axis positions
-        x0_pixels = self.map_value(0, self.min_x, self.max_x, 0, self.width)
-        y0_pixels = self.map_value(0, self.min_y, self.max_y, self.height, 0)
-
-        small_grid_unit = grid_unit / 5
+        return grid_unit, power, limit
 
-        # draw light grey grid with distance grid_unit / 5
-        for x in numpy.arange(math.ceil(self.min_x / small_grid_unit) * small_grid_unit, self.max_x + limit * 2, small_grid_unit):
-            # calculate x value in pixels
-            x_pixels = self.map_value(x, self.min_x, self.max_x, 0, self.width)
-            pygame.draw.line(self.screen, (245, 245, 245),
-                             (x_pixels, 0), (x_pixels, self.height))
-
-        for y in numpy.arange(math.ceil(self.min_y / small_grid_unit) * small_grid_unit, self.max_y + limit * 2, small_grid_unit):
-            # calculate y value in pixels
-            y_pixels = self.map_value(
-                y, self.min_y, self.max_y, self.height, 0)
-            pygame.draw.line(self.screen, (245, 245, 245),
-                             (0, y_pixels), (self.width, y_pixels))
+    # function that draws the grid
+    def draw_grid(self):
+        grid_unit, power, limit = self.get_grid_unit()
 
-        # draw grey grid with distance grid_unit
-        for x in numpy.arange(math.ceil(self.min_x / grid_unit) * grid_unit, self.max_x + limit * 2, grid_unit):
-            # calculate x value in pixels
-            x_pixels = self.map_value(x, self.min_x, self.max_x, 0, self.width)
-            pygame.draw.line(self.screen, (200, 200, 200),
-                             (x_pixels, 0), (x_pixels, self.height))
+        # draw the cached grid lines
+        self.update_grid_layer(grid_unit, limit)
+        self.screen.blit(self.grid_layer, (0, 0))
 
-        for y in numpy.arange(math.ceil(self.min_y / grid_unit) * grid_unit, self.max_y + limit * 2, grid_unit):
-            # calculate y value in pixels
-            y_pixels = self.map_value(
-                y, self.min_y, self.max_y, self.height, 0)
-            pygame.draw.line(self.screen, (200, 200, 200),
-                             (0, y_pixels), (self.width, y_pixels))
+        # calculate axis positions
+        x0_pixels = self.map_value(0, self.min_x, self.max_x, 0, self.width)
+        y0_pixels = self.map_value(0, self.min_y, self.max_y, self.height, 0)
 
         # draw numbers along the axes
         for x in numpy.arange(math.ceil(self.min_x / grid_unit) * grid_unit, self.max_x + limit * 2, grid_unit):
             if abs(x) > grid_unit / 2:
-                text = self.small_font.render(
-                    str(int(x)) if power >= 0 else str(round(x, -power)), True, (0, 0, 0))
+                text = self.render_label(
+                    str(int(x)) if power >= 0 else str(round(x, -power)))
                 text_y = y0_pixels + 1
 
                 # limit text_y to screen
@@ -213,8 +276,8 @@ class GraphPlotter:
 
         for y in numpy.arange(math.ceil(self.min_y / grid_unit) * grid_unit, self.max_y + limit * 2, grid_unit):
             if abs(y) > grid_unit / 2:
-                text = self.small_font.render(
-                    str(int(y)) if power >= 0 else str(round(y, -power)), True, (0, 0, 0))
+                text = self.render_label(
+                    str(int(y)) if power >= 0 else str(round(y, -power)))
                 text_x = x0_pixels + 3
 
                 # limit text_x to screen
@@ -228,105 +291,222 @@ class GraphPlotter:
         pygame.draw.line(self.screen, (0, 0, 0),
                          (0, y0_pixels), (self.width, y0_pixels))
 
+    # return the rendered text of an axis number, rendered numbers are saved
+    def render_label(self, string):
+        text = self.labels.get(string)
+        if text is None:
+            # forget old numbers if too many were saved
+            if len(self.labels) > 1000:
+                self.labels = {}
+            text = fonts.get("Arial", 12).render(string, True, (0, 0, 0))
+            self.labels[string] = text
+        return text
+
+    # update the layer with the grid lines, if the screen was only moved, the layer is moved and only the new parts are drawn
+    def update_grid_layer(self, grid_unit, limit):
+        x_scale = self.width / (self.max_x - self.min_x)
+        y_scale = self.height / (self.max_y - self.min_y)
+
+        if self.grid_layer is not None and self.grid_layer.get_size() == (self.width, self.height) and self.grid_layer_unit == grid_unit \
+                and math.isclose(x_scale, self.grid_layer_scale[0], rel_tol=1e-9) and math.isclose(y_scale, self.grid_layer_scale[1], rel_tol=1e-9):
+            # calculate how far the layer has to be moved in pixels
+            shift_x = (self.grid_layer_min_x - self.min_x) * x_scale
+            shift_y = (self.max_y - self.grid_layer_max_y) * y_scale
+            dx = round(shift_x)
+            dy = round(shift_y)
+
+            # only move the layer by whole pixels and if some of it stays visible
+            if abs(shift_x - dx) < 0.01 and abs(shift_y - dy) < 0.01 and abs(dx) < self.width and abs(dy) < self.height:
+                if dx != 0 or dy != 0:
+                    self.grid_layer.scroll(dx, dy)
+                    self.grid_layer_min_x -= dx / x_scale
+                    self.grid_layer_max_y += dy / y_scale
+
+                    # draw the parts that were moved onto the screen
+                    if dx > 0:
+                        self.render_grid(grid_unit, limit, pygame.Rect(0, 0, dx, self.height))
+                    elif dx < 0:
+                        self.render_grid(grid_unit, limit, pygame.Rect(self.width + dx, 0, -dx, self.height))
+                    if dy > 0:
+                        self.render_grid(grid_unit, limit, pygame.Rect(0, 0, self.width, dy))
+                    elif dy < 0:
+                        self.render_grid(grid_unit, limit, pygame.Rect(0, self.height + dy, self.width, -dy))
+                return
+
+        # draw the whole layer again
+        if self.grid_layer is None or self.grid_layer.get_size() != (self.width, self.height):
+            self.grid_layer = pygame.Surface((self.width, self.height))
+        self.grid_layer_unit = grid_unit
+        self.grid_layer_scale = (x_scale, y_scale)
+        self.grid_layer_min_x = self.min_x
+        self.grid_layer_max_y = self.max_y
+        self.render_grid(grid_unit, limit, self.grid_layer.get_rect())
+
+    # draw the grid lines inside the rect onto the grid layer
+    def render_grid(self, grid_unit, limit, rect):
+        # fill rect white
+        self.grid_layer.fill((255, 255, 255), rect)
+
+        small_grid_unit = grid_unit / 5
+
+        # draw light grey grid with distance grid_unit / 5
+        self.draw_grid_lines(numpy.arange(math.ceil(self.min_x / small_grid_unit) * small_grid_unit, self.max_x + limit * 2, small_grid_unit),
+                             numpy.arange(math.ceil(self.min_y / small_grid_unit) * small_grid_unit, self.max_y + limit * 2, small_grid_unit), (245, 245, 245), rect)
+
+        # draw grey grid with distance grid_unit
+        self.draw_grid_lines(numpy.arange(math.ceil(self.min_x / grid_unit) * grid_unit, self.max_x + limit * 2, grid_unit),
+                             numpy.arange(math.ceil(self.min_y / grid_unit) * grid_unit, self.max_y + limit * 2, grid_unit), (200, 200, 200), rect)
+
+    # function that draws vertical lines at the x values and horizontal lines at the y values inside the rect of the grid layer
+    def draw_grid_lines(self, xs, ys, color, rect):
+        # calculate x and y values in pixels that are inside the rect
+        x_pixels = numpy.round(self.map_value(xs, self.min_x, self.max_x, 0, self.width)).astype(int)
+        y_pixels = numpy.round(self.map_value(ys, self.min_y, self.max_y, self.height, 0)).astype(int)
+        x_pixels = x_pixels[(x_pixels >= rect.left) & (x_pixels < rect.right)]
+        y_pixels = y_pixels[(y_pixels >= rect.top) & (y_pixels < rect.bottom)]
+
+        # write all lines into the pixels of the layer at once
+        try:
+            pixels = pygame.surfarray.pixels2d(self.grid_layer)
+        except ValueError:
+            # surfaces with 24 bits per pixel can't be referenced as an array
+            for x in x_pixels:
+                self.grid_layer.fill(color, (x, rect.top, 1, rect.height))
+            for y in y_pixels:
+                self.grid_layer.fill(color, (rect.left, y, rect.width, 1))
+            return
+
+        mapped_color = self.grid_layer.map_rgb(color)
+        pixels[x_pixels, rect.top:rect.bottom] = mapped_color
+        pixels[rect.left:rect.right, y_pixels] = mapped_color
+        del pixels
+
     # function that draws the graph
-    def draw_function(self, index):
-        previousX = None
-        previousY = None
+    # the graph is drawn between start and end (default: the screen up to the animation) on the surface (default: the screen)
+    # dense tells if the graph is drawn as an envelope, it's checked between start and end if it isn't given
+    def draw_function(self, index, start=None, end=None, surface=None, dense=None):
+        start = self.min_x if start is None else start
+        end = min(self.animation_x, self.max_x) if end is None else end
+        surface = self.screen if surface is None else surface
+        if end <= start:
+            return
 
-        # convert animation x to pixels
-        animation_pixels = self.map_value(
-            self.animation_x, self.min_x, self.max_x, 0, self.width)
+        # evaluate the function about every eighth pixel and refine where the curve bends, samples are reused when the screen is moved
+        step = self.map_value(8, 0, self.width, 0, self.max_x - self.min_x)
+        y_scale = self.height / (self.max_y - self.min_y)
+
+        # samples are evaluated precisely when the screen is zoomed in too far for floats
+        # graphs that oscillate faster than the pixels are drawn as an envelope before they're refined
+        precise = self.is_precise(index)
+        if dense is None:
+            dense = self.is_dense(index, start, end, precise)
+        if dense:
+            self.draw_envelope(index, start, end, surface)
+            return
 
-        # draw the graph
-        for pixel in numpy.arange(0, animation_pixels, 3):
-            # convert pixel to x
-            x = self.map_value(pixel, 0, self.width, self.min_x, self.max_x)
+        # only sample the ranges where the graph can be on the screen, the line is broken between two ranges
+        samples = [self.functions[index].get_samples(range_start, range_end, step, y_scale, precise)
+                   for range_start, range_end in self.get_visible_ranges(index, start, end)]
+        xs = numpy.concatenate([numpy.append(sample[0], numpy.nan) for sample in samples] + [numpy.empty(0)])
+        ys = numpy.concatenate([numpy.append(sample[1], numpy.nan) for sample in samples] + [numpy.empty(0)])
 
-            # evaluate the function
-            y = self.functions[index].get_value(x)
+        # map x values to pixels
+        pixels = self.map_value(xs, self.min_x, self.max_x, 0, self.width)
 
-            if y is not None:
-                # map x from -10 to 10 to 0 to screen width
-                x = self.map_value(x, self.min_x, self.max_x, 0, self.width)
+        # map y values to pixels
+        y_pixels = self.map_value(ys, self.max_y, self.min_y, 0, self.height)
 
-                # map y from -10 to 10 to 0 to screen height
-                y = self.map_value(y, self.max_y, self.min_y, 0, self.height)
+        # find the runs of defined points, starts and ends alternate
+        defined = numpy.concatenate(([0], ~numpy.isnan(y_pixels), [0]))
+        edges = numpy.flatnonzero(numpy.diff(defined))
+        points = numpy.column_stack((pixels, y_pixels))
 
-                if previousX is not None:
-                    # draw line from previous point to current point
-                    pygame.draw.line(
-                        self.screen, self.colors[index], (previousX, previousY), (x, y), 1)
+        # draw every run as one line through all of its points
+        for first, last in zip(edges[::2], edges[1::2]):
+            if last - first > 1:
+                if self.anti_aliasing:
+                    pygame.draw.aalines(surface, self.colors[index], False, points[first:last])
+                else:
+                    pygame.draw.lines(surface, self.colors[index], False, points[first:last])
+
+    # return the x ranges between min_x and max_x where the graph can be on the screen
+    # the function is evaluated on intervals, intervals where all values are above or below the screen are left out
+    def get_visible_ranges(self, index, min_x, max_x):
+        if max_x <= min_x:
+            return []
+        if not self.functions[index].has_intervals():
+            return [(min_x, max_x)]
+
+        edges = numpy.linspace(min_x, max_x, CULL_INTERVALS + 1)
+        lows, highs = self.functions[index].get_intervals(edges[:-1], edges[1:])
+        visible = (highs >= self.min_y) & (lows <= self.max_y)
+
+        # join neighbouring visible intervals, starts and ends alternate
+        changes = numpy.flatnonzero(numpy.diff(numpy.concatenate(([0], visible, [0]))))
+        return [(edges[start], edges[end]) for start, end in zip(changes[::2], changes[1::2])]
+
+    # return if the graph turns so often between start and end that it has to be drawn as an envelope
+    # the unrefined samples finer than the pixels are checked, coarser samples of fast oscillations alias to slow waves
+    # graphs that only oscillate in a part of the screen like sin(1/x) are dense as well
+    def is_dense(self, index, start, end, precise=False):
+        pixel = self.map_value(1, 0, self.width, 0, self.max_x - self.min_x)
+        xs, ys = self.functions[index].get_samples(start, end, pixel / DENSE_SAMPLES_PER_PIXEL, precise=precise)
+        turns = get_turns(ys).astype(int)
+        if len(turns) == 0:
+            return False
+        window = DENSE_WINDOW * DENSE_SAMPLES_PER_PIXEL
+        return bool(numpy.any(numpy.add.reduceat(turns, numpy.arange(0, len(turns), window)) > window * DENSE_TURNS))
+
+    # function that draws the graph between start and end on the surface as a vertical span from the lowest to the highest value in every pixel column
+    def draw_envelope(self, index, start, end, surface):
+        pixel = self.map_value(1, 0, self.width, 0, self.max_x - self.min_x)
+        xs, lows, highs = self.functions[index].get_envelope(start, end, pixel)
+
+        # map to pixels, values far outside the screen are moved to its border
+        defined = ~numpy.isnan(lows)
+        x_pixels = numpy.floor(self.map_value(xs[defined], self.min_x, self.max_x, 0, self.width)).astype(int)
+        tops = numpy.floor(numpy.clip(self.map_value(highs[defined], self.max_y, self.min_y, 0, self.height), 0, self.height)).astype(int)
+        bottoms = numpy.ceil(numpy.clip(self.map_value(lows[defined], self.max_y, self.min_y, 0, self.height), -1, self.height - 1)).astype(int)
+
+        # join the spans of columns in the same pixel column
+        inside = (x_pixels >= 0) & (x_pixels < self.width)
+        column_tops = numpy.full(self.width, self.height)
+        column_bottoms = numpy.full(self.width, -1)
+        numpy.minimum.at(column_tops, x_pixels[inside], tops[inside])
+        numpy.maximum.at(column_bottoms, x_pixels[inside], bottoms[inside])
+
+        # write all spans into the pixels of the surface at once
+        try:
+            pixels = pygame.surfarray.pixels2d(surface)
+        except ValueError:
+            # surfaces with 24 bits per pixel can't be referenced as an array
+            for x in numpy.flatnonzero(column_bottoms >= column_tops).tolist():
+                surface.fill(self.colors[index], (x, column_tops[x], 1, column_bottoms[x] - column_tops[x] + 1))
+            return
 
-                # save previous x and y
-                previousX = x
-                previousY = y
-            else:
-                previousX = None
-                previousY = None
+        # mapped colors of surfaces with alpha can be negative, they're written as unsigned values
+        rows = numpy.arange(self.height)
+        color = surface.map_rgb(self.colors[index]) & 0xFFFFFFFF
+        pixels[:self.width, :self.height][(rows >= column_tops[:, None]) & (rows <= column_bottoms[:, None])] = color
+        del pixels
 
     # function that draws all graphs
     def draw_graphs(self):
         # draw grid
-        self.draw_grid()
+        with self.profiler.measure("grid"):
+            self.draw_grid()
 
         # draw function
-        for i in range(len(self.functions)):
-            # draw function if it's valid
-            if self.functions[i].is_valid():
-                self.draw_function(i)
-
-        # draw special point with most descriptions
-        hovered_point = None
-        for p in self.special_points:
-            # draw point if mouse is hovered close to it
-            x = self.map_value(p.x, self.min_x, self.max_x, 0, self.width)
-            y = self.map_value(p.y, self.min_y, self.max_y, self.height, 0)
-            if abs(x - pygame.mouse.get_pos()[0]) < 12 and abs(y - pygame.mouse.get_pos()[1]) < 12:
-                if hovered_point is None:
-                    hovered_point = p
-                else:
-                    if len(p.descriptions) > len(hovered_point.descriptions):
-                        hovered_point = p
-
-        if hovered_point is not None:
-            # map x and y of point to screen
-            x = self.map_value(hovered_point.x, self.min_x,
-                               self.max_x, 0, self.width)
-            y = self.map_value(hovered_point.y, self.min_y,
-                               self.max_y, self.height, 0)
-
-            # draw circle with inside color of function
-            pygame.draw.circle(
-                self.screen, self.colors[hovered_point.index], (x, y), 7)
-            pygame.gfxdraw.aacircle(self.screen, int(x), int(y), 7, (0, 0, 0))
-
-            # draw white rectangle with grey border below the point with all information
-
-            # render point coordinates as text
-            coordinates = self.large_font.render(
-                "(" + str(hovered_point.x) + ", " + str(hovered_point.y) + ")", True, (0, 0, 0))
-
-            # render descriptions as text
-            descriptions = [self.large_font.render(
-                desc, True, (0, 0, 0)) for desc in hovered_point.descriptions]
-
-            # calculate width and height of rect
-            width = 4 + max([coordinates.get_width()] +
-                            [desc.get_width() for desc in descriptions]) + 4
-            height = 3 + coordinates.get_height() + 3 + \
-                sum([desc.get_height() for desc in descriptions]) + 3
-
-            pygame.draw.rect(self.screen, (255, 255, 255),
-                             (x - width / 2, y + 10, width, height))
-            pygame.draw.rect(self.screen, (200, 200, 200),
-                             (x - width / 2, y + 10, width, height), 1)
-
-            self.screen.blit(
-                coordinates, (x - coordinates.get_width() / 2, y + 13))
-            cur_y = y + 13 + coordinates.get_height() + 3
-            for desc in descriptions:
-                self.screen.blit(desc, (x - desc.get_width() / 2, cur_y))
-                cur_y += desc.get_height()
+        if self.animation_speed != 0:
+            self.draw_animation()
+        else:
+            self.animation_layer = None
+            self.prefetch_samples()
+            for i in range(len(self.functions)):
+                # draw function if it's valid
+                if self.functions[i].is_valid():
+                    with self.profiler.measure("draw " + chr(ord('f') + i)):
+                        self.draw_function(i)
 
         # handle the animation state
         if self.animation_speed == 0:
@@ -349,6 +529,104 @@ class GraphPlotter:
                     time() - self.last_animation_time), 0, self.width, 0, (self.max_x - self.min_x))
                 self.last_animation_time = time()
 
+    # evaluate the samples on the screen of all expensive functions at once on the evaluation pool
+    # if the analysis is using the pool, the samples are evaluated on this thread while drawing instead of waiting for it
+    def prefetch_samples(self):
+        if self.evaluation_pool is None:
+            return
+        indices = {function.id: i for i, function in enumerate(self.functions)}
+        step = self.map_value(8, 0, self.width, 0, self.max_x - self.min_x)
+        for precise in (False, True):
+            functions = [function for i, function in enumerate(self.functions) if function.is_valid()
+                         and self.is_precise(i) == precise and self.evaluation_pool.is_worth(function, TILE_SIZE, precise)]
+            if len(functions) == 0:
+                continue
+
+            with self.profiler.measure("prefetch"):
+                sample_cache.prefetch(functions, self.min_x, self.max_x, step, precise, lambda jobs: self.evaluation_pool.evaluate(
+                    [(indices[function.id], function, xs, precise) for function, xs in jobs], blocking=False))
+
+    # function that draws the graphs up to the animation x, only the part revealed since the last frame is drawn onto the animation layer
+    def draw_animation(self):
+        key = (self.min_x, self.max_x, self.min_y, self.max_y, self.width, self.height,
+               self.anti_aliasing, tuple(function.id for function in self.functions))
+        end = min(self.animation_x, self.max_x)
+
+        # start a new layer if the screen or the functions changed or the animation started again
+        if self.animation_layer is None or key != self.animation_key or end < self.animation_drawn_x:
+            self.animation_layer = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+            self.animation_key = key
+            self.animation_drawn_x = self.min_x
+
+            # the few pixels revealed in a frame are too few to tell if a graph is dense, so the whole screen is checked
+            self.animation_dense = [function.is_valid() and self.is_dense(i, self.min_x, self.max_x, self.is_precise(i))
+                                    for i, function in enumerate(self.functions)]
+
+        for i in range(len(self.functions)):
+            if self.functions[i].is_valid():
+                with self.profiler.measure("draw " + chr(ord('f') + i)):
+                    self.draw_function(i, self.animation_drawn_x, end, self.animation_layer, self.animation_dense[i])
+        self.animation_drawn_x = max(self.animation_drawn_x, end)
+
+        self.screen.blit(self.animation_layer, (0, 0))
+
+    # return the special point with most descriptions that is close to the position, None if there's none
+    def get_hovered_point(self, pos):
+        # point is hovered if mouse is closer than 12 pixels to it
+        x = self.map_value(pos[0], 0, self.width, self.min_x, self.max_x)
+        y = self.map_value(pos[1], self.height, 0, self.min_y, self.max_y)
+        distance_x = self.map_value(12, 0, self.width, 0, self.max_x - self.min_x)
+        distance_y = self.map_value(12, 0, self.height, 0, self.max_y - self.min_y)
+
+        hovered_point = None
+        for p in self.special_points.get_close_points(x, y, distance_x, distance_y):
+            if hovered_point is None or len(p.descriptions) > len(hovered_point.descriptions):
+                hovered_point = p
+
+        return hovered_point
+
+    # draw special point with its information, returns the rect that was drawn on
+    def draw_special_point(self, point):
+        # map x and y of point to screen
+        x = self.map_value(point.x, self.min_x, self.max_x, 0, self.width)
+        y = self.map_value(point.y, self.min_y, self.max_y, self.height, 0)
+
+        # draw circle with inside color of function
+        pygame.draw.circle(
+            self.screen, self.colors[point.index], (x, y), 7)
+        pygame.gfxdraw.aacircle(self.screen, int(x), int(y), 7, (0, 0, 0))
+
+        # draw white rectangle with grey border below the point with all information
+
+        # render point coordinates as text
+        coordinates = fonts.get("Arial", 16).render(
+            "(" + str(point.x) + ", " + str(point.y) + ")", True, (0, 0, 0))
+
+        # render descriptions as text
+        descriptions = [fonts.get("Arial", 16).render(
+            desc, True, (0, 0, 0)) for desc in point.descriptions]
+
+        # calculate width and height of rect
+        width = 4 + max([coordinates.get_width()] +
+                        [desc.get_width() for desc in descriptions]) + 4
+        height = 3 + coordinates.get_height() + 3 + \
+            sum([desc.get_height() for desc in descriptions]) + 3
+
+        pygame.draw.rect(self.screen, (255, 255, 255),
+                         (x - width / 2, y + 10, width, height))
+        pygame.draw.rect(self.screen, (200, 200, 200),
+                         (x - width / 2, y + 10, width, height), 1)
+
+        self.screen.blit(
+            coordinates, (x - coordinates.get_width() / 2, y + 13))
+        cur_y = y + 13 + coordinates.get_height() + 3
+        for desc in descriptions:
+            self.screen.blit(desc, (x - desc.get_width() / 2, cur_y))
+            cur_y += desc.get_height()
+
+        # rect around circle and information
+        return pygame.Rect(x - width / 2, y - 8, width, 18 + height).union(pygame.Rect(x - 8, y - 8, 17, 17))
+
     # start animation
     def start_animation(self):
         self.animation_speed = 200  # measured in 0.1% of the screen width per second
@@ -361,238 +639,58 @@ class GraphPlotter:
         self.animation_speed = 0
         self.animation_x = self.max_x
 
-    # print cache info of every function
-    def print_cache_info(self):
-        for f in self.functions:
-            if f.is_valid():
-                f.print_cache_info()
-
-    # function that analyses all graphs for zeros, maximums, minimums and intersecitons
-    def analyse_graphs(self, start = None, end = None):
-        # if start and end are not set, set them to the whole graph
+    # return the evaluations since the last call, the cache statistics and the cache size of every valid function by its name
+    def get_function_statistics(self):
+        statistics = {}
+        for i in range(len(self.functions)):
+            if self.functions[i].is_valid():
+                tiles, hits, misses, bytes_used = self.functions[i].get_cache_info()
+                statistics[chr(ord('f') + i)] = {
+                    "evaluations": self.functions[i].take_evaluations(),
+                    "tiles": tiles,
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) * 100 if hits + misses > 0 else 0,
+                    "bytes": bytes_used,
+                }
+        return statistics
+
+    # function that analyses all graphs for zeros, maximums, minimums and intersections on the analysis worker
+    def analyse_graphs(self, start=None, end=None):
         if start is None:
-            start = self.min_x
-            end = self.max_x
-            self.special_points = []
-
             # save analysed borders
             self.analysed_min_x = self.min_x
             self.analysed_max_x = self.max_x
 
-        # save last 2 values of each function
-        last_values = []
-        last2_values = []
-
-        # save last special points
-        last_special_points = []
-
-        # sensitivity for root finding
-        sensitivity = 100000
-
-        # loop through x-values
-        step_size = (self.max_x - self.min_x) / 100
-
-        # first run is a test run to test for equal functions -> infinite intersections; or zero functions -> infinite zeros
-        test_run = True
-
-        for x in numpy.arange(start - step_size, end, step_size):
-            new_values = [f.get_value(x) for f in self.functions]
-            new_special_points = []
-
-            for i in range(len(new_values)):
-                if new_values[i] is None:
-                    continue
-
-                if new_values[i] == 0:
-                    # add zero if exactly 0
-                    if not test_run:
-                        self.add_special_point(
-                            x, i, "Zero", step_size / sensitivity * 2, last_special_points)
-                    new_special_points.append([i, "Zero"])
-                elif len(last_values) > 0 and last_values[i] is not None:
-                    # check if last value an new value have different signs
-                    if new_values[i] > 0 and last_values[i] < 0 or new_values[i] < 0 and last_values[i] > 0:
-                        # root finding algorithm to find zeros -> bisection method
-                        step = step_size / 4
-                        midpoint = x - step_size / 2
-                        broken = False
-                        while step > step_size / sensitivity:
-                            value = self.functions[i].get_value(midpoint)
-                            if value is None:
-                                broken = True
-                                break
-                            elif value == 0:
-                                break
-                            elif numpy.sign(value) == numpy.sign(last_values[i]):
-                                midpoint += step
-                                step /= 2
-                            else:
-                                midpoint -= step
-                                step /= 2
-
-                        # add zero if found
-                        if not broken:
-                            if not test_run:
-                                self.add_special_point(
-                                    midpoint, i, "Zero", step_size / sensitivity * 2, last_special_points)
-                            new_special_points.append([i, "Zero"])
-
-                # search for intersections
-                for j in range(i + 1, len(new_values)):
-                    if new_values[j] is None:
-                        continue
-
-                    if new_values[i] == new_values[j]:
-                        if not test_run:
-                            self.add_special_point(
-                                x, i, "Intersection", step_size / sensitivity * 2, last_special_points)
-                        new_special_points.append([i, "Intersection"])
-                        if not test_run:
-                            self.add_special_point(
-                                x, j, "Intersection", step_size / sensitivity * 2, last_special_points)
-                        new_special_points.append([j, "Intersection"])
-                    elif len(last_values) > 0 and last_values[i] is not None and last_values[j] is not None:
-                        if numpy.sign(new_values[i] - new_values[j]) != numpy.sign(last_values[i] - last_values[j]):
-                            # root finding algorithm to find intersections
-                            step = step_size / 4
-                            midpoint = x - step_size / 2
-                            broken = False
-                            while step > step_size / sensitivity:
-                                iValue = self.functions[i].get_value(midpoint)
-                                jValue = self.functions[j].get_value(midpoint)
-                                if iValue is None or jValue is None:
-                                    broken = True
-                                    break
-                                elif iValue == jValue:
-                                    break
-                                elif numpy.sign(iValue - jValue) == numpy.sign(last_values[i] - last_values[j]):
-                                    midpoint += step
-                                    step /= 2
-                                else:
-                                    midpoint -= step
-                                    step /= 2
-                            if not broken:
-                                if not test_run:
-                                    self.add_special_point(
-                                        midpoint, i, "Intersection", step_size / sensitivity * 2, last_special_points)
-                                new_special_points.append([i, "Intersection"])
-                                if not test_run:
-                                    self.add_special_point(
-                                        midpoint, j, "Intersection", step_size / sensitivity * 2, last_special_points)
-                                new_special_points.append([j, "Intersection"])
-
-                # check for maximums and minimums
-                if len(last_values) > 0 and len(last2_values) > 0:
-                    for i in range(len(new_values)):
-                        if new_values[i] is None or last_values[i] is None or last2_values[i] is None:
-                            continue
-
-                        # check for maximums or minimums
-                        if last_values[i] > last2_values[i] and last_values[i] > new_values[i] or last_values[i] < last2_values[i] and last_values[i] < new_values[i]:
-                            # save whether it's a maximum or minimum
-                            sign = numpy.sign(last_values[i] - last2_values[i])
-
-                            # golden ratio and bounds
-                            gr = (1 + math.sqrt(5)) / 2
-                            a = x - 2 * step_size
-                            b = x
-
-                            # find maximum by golden-section search, inaccuracies because of missing precision
-                            broken = False
-                            while b - a > step_size / sensitivity and not broken:
-                                # so that (b - c) / (c - a) = gr
-                                c = (gr * a + b) / (1 + gr)
-                                cy = self.functions[i].get_value(c)
-                                if cy is None:
-                                    continue
-
-                                d = a + b - c
-                                dy = self.functions[i].get_value(d)
-                                if dy is None:
-                                    broken = True
-
-                                if numpy.sign(dy - cy) == 0:
-                                    break
-                                elif numpy.sign(dy - cy) == sign:
-                                    a = c
-                                else:
-                                    b = d
-
-                            if not broken:
-                                extr_x = (a + b) / 2
-                                extr_y = self.functions[i].get_value(extr_x)
-
-                                # save extremum
-                                if sign == 1:
-                                    if not test_run:
-                                        self.add_special_point(
-                                            extr_x, i, "Maximum", step_size / sensitivity * 2, last_special_points)
-                                    new_special_points.append([i, "Maximum"])
-                                else:
-                                    if not test_run:
-                                        self.add_special_point(
-                                            extr_x, i, "Minimum", step_size / sensitivity * 2, last_special_points)
-                                    new_special_points.append([i, "Minimum"])
-
-                                # if value is close enough to zero, save it as a zero
-                                if abs(extr_y) < step_size / sensitivity * 100:
-                                    if not test_run:
-                                        self.add_special_point(
-                                            extr_x, i, "Zero", step_size / sensitivity * 2, last_special_points)
-                                    new_special_points.append([i, "Zero"])
-
-                                # if value is close enough to another value, save it as an intersection
-                                for j in range(len(new_values)):
-                                    if i == j:
-                                        continue
-                                    valueJ = self.functions[j].get_value(
-                                        extr_x)
-                                    if valueJ is None:
-                                        continue
-                                    if abs(extr_y - valueJ) < step_size / sensitivity * 100:
-                                        if not test_run:
-                                            self.add_special_point(
-                                                extr_x, i, "Intersection", step_size / sensitivity * 2, last_special_points)
-                                        new_special_points.append(
-                                            [i, "Intersection"])
-                                        if not test_run:
-                                            self.add_special_point(
-                                                extr_x, j, "Intersection", step_size / sensitivity * 2, last_special_points)
-                                        new_special_points.append(
-                                            [j, "Intersection"])
-
-            last2_values = last_values
-            last_values = new_values
-            last_special_points = new_special_points
-            test_run = False
-
-        # check for y-intercepts
-        for i in range(len(self.functions)):
-            if self.functions[i].get_value(0) is not None:
-                self.add_special_point(
-                    0, i, "Y-Intercept", step_size / sensitivity * 2, [])
-
-    # add special point to list
-    def add_special_point(self, x, index, description, sensitivity, last_special_points):
-        # check if point is already in list
-        for p in last_special_points:
-            if p[0] == index and p[1] == description:
-                return
+        self.analysis_worker.submit(Analysis(
+            self.functions, self.min_x, self.max_x, self.min_y, self.max_y, self.height, start, end, self.evaluation_pool))
 
-        # round x to two digits above sensitivity
-        x = round(x, -math.ceil(math.log10(sensitivity)) - 1)
+    # add the special points of finished analyses, returns if any analysis finished
+    def update_special_points(self):
+        results = self.analysis_worker.get_results()
+        for analysis in results:
+            old_points = self.special_points
+            if analysis.is_full:
+                self.special_points = PointIndex()
 
-        for p in self.special_points:
-            if p.add_point(x, index, description):
-                return
+            # points that were already found keep the time they were added
+            for point in analysis.special_points:
+                old_point = old_points.points.get((point.index, point.x))
+                point.added_time = old_point.added_time if old_point is not None else time()
+                self.special_points.add(point)
 
-        if description == "Zero":
-            y = 0
-        else:
-            y = round(self.functions[index].get_value(
-                x), -math.ceil(math.log10(sensitivity)) - 1)
+            self.analysis_statistics = analysis.statistics
+
+        # forget points that are more than a screen width away
+        if len(results) > 0:
+            self.special_points.remove_outside(
+                2 * self.min_x - self.max_x, 2 * self.max_x - self.min_x)
 
-        self.special_points.append(Point(x, y, index, description))
+        return len(results) > 0
+
+    # return how visible a special point is, special points fade in after they were found
+    def get_point_opacity(self, point):
+        return min(1, (time() - point.added_time) / 0.3)
 
     # evaluate function as string without x
     def evaluate_function_as_string(self, index):
@@ -610,30 +708,3 @@ class GraphPlotter:
     # return if function index is valid
     def is_valid_function(self, index):
         return self.functions[index].is_valid()
-
-# class for points
-class Point:
-    def __init__(self, x, y, index, description):
-        # convert -0 to 0
-        self.x = x if x != 0 else 0
-        self.y = y if y != 0 else 0
-        self.index = index
-        self.descriptions = [description]
-
-    # add point to point if same x values
-    def add_point(self, x, index, description):
-        # check if point has same x value
-        if index == self.index and x == self.x:
-            # insert description alphabetically
-            if description not in self.descriptions:
-                added = False
-                for i in range(len(self.descriptions)):
-                    if description < self.descriptions[i]:
-                        self.descriptions.insert(i, description)
-                        added = True
-                        break
-                if not added:
-                    self.descriptions.append(description)
-            
-            return True
-        return False
@@ -0,0 +1,191 @@
+# module for evaluating sympy expressions on intervals of x values
+# an interval evaluation returns a lower and an upper bound of the expression on every interval at once
+# bounds of -inf and inf mean the range is unknown, bounds of nan mean the expression is undefined on the whole interval
+import math
+import numpy
+import sympy
+from sympy.core.function import AppliedUndef
+
+# monotonically increasing functions, evaluated at the bounds of the interval
+INCREASING = {sympy.exp: numpy.exp, sympy.atan: numpy.arctan, sympy.sinh: numpy.sinh, sympy.tanh: numpy.tanh, sympy.asinh: numpy.arcsinh}
+
+# widen the bounds by one floating point number in each direction, so rounding errors can't make them too tight
+# the interval is undefined if either bound is undefined
+def widen(lows, highs):
+    empty = numpy.isnan(lows) | numpy.isnan(highs)
+    lows = numpy.where(empty, numpy.nan, numpy.nextafter(lows, -numpy.inf))
+    highs = numpy.where(empty, numpy.nan, numpy.nextafter(highs, numpy.inf))
+    return lows, highs
+
+# check for every interval if it contains point + k * period for any whole number k
+def contains_periodic(lows, highs, point, period):
+    with numpy.errstate(invalid="ignore"):
+        return point + numpy.ceil((lows - point) / period) * period <= highs
+
+def add(a, b):
+    return widen(a[0] + b[0], a[1] + b[1])
+
+def multiply(a, b):
+    empty = numpy.isnan(a[0]) | numpy.isnan(b[0])
+    products = numpy.stack((a[0] * b[0], a[0] * b[1], a[1] * b[0], a[1] * b[1]))
+
+    # 0 * inf is 0 for the bounds of intervals
+    products[numpy.isnan(products) & ~empty] = 0
+    return widen(products.min(axis=0), products.max(axis=0))
+
+def reciprocal(a):
+    lows, highs = a
+    with numpy.errstate(divide="ignore"):
+        # intervals that contain zero are unbounded, only the bound on the other side of zero is known
+        new_lows = numpy.where((lows > 0) | (highs < 0), 1 / highs, numpy.where(lows == 0, 1 / highs, -numpy.inf))
+        new_highs = numpy.where((lows > 0) | (highs < 0), 1 / lows, numpy.where(highs == 0, 1 / lows, numpy.inf))
+
+    # 1 / 0 is undefined
+    empty = (lows == 0) & (highs == 0) | numpy.isnan(lows) | numpy.isnan(highs)
+    return widen(numpy.where(empty, numpy.nan, new_lows), numpy.where(empty, numpy.nan, new_highs))
+
+def absolute(a):
+    lows, highs = a
+    new_lows = numpy.where(lows >= 0, lows, numpy.where(highs <= 0, -highs, 0))
+    new_highs = numpy.maximum(numpy.abs(lows), numpy.abs(highs))
+    return widen(new_lows, new_highs)
+
+def integer_power(a, n):
+    if n < 0:
+        return integer_power(reciprocal(a), -n)
+    if n == 0:
+        return widen(numpy.where(numpy.isnan(a[0]), numpy.nan, 1.0), numpy.where(numpy.isnan(a[1]), numpy.nan, 1.0))
+
+    # even powers have their minimum at the smallest absolute value
+    if n % 2 == 0:
+        a = absolute(a)
+    return widen(a[0] ** n, a[1] ** n)
+
+def real_power(a, p):
+    lows, highs = a
+
+    # non-integer powers are only defined for x >= 0
+    lows = numpy.where(highs < 0, numpy.nan, numpy.maximum(lows, 0))
+    if p < 0:
+        return reciprocal(real_power((lows, highs), -p))
+    return widen(lows ** p, highs ** p)
+
+def log(a):
+    lows, highs = a
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return widen(numpy.where(highs <= 0, numpy.nan, numpy.log(numpy.maximum(lows, 0))), numpy.log(highs))
+
+def sin(a):
+    lows, highs = a
+    with numpy.errstate(invalid="ignore"):
+        low_values = numpy.sin(lows)
+        high_values = numpy.sin(highs)
+    new_lows = numpy.minimum(low_values, high_values)
+    new_highs = numpy.maximum(low_values, high_values)
+
+    # the maximum or minimum of a period is inside the interval
+    new_highs = numpy.where(contains_periodic(lows, highs, math.pi / 2, 2 * math.pi), 1, new_highs)
+    new_lows = numpy.where(contains_periodic(lows, highs, -math.pi / 2, 2 * math.pi), -1, new_lows)
+
+    # intervals longer than a period or with infinite bounds have the whole range
+    whole = ~(highs - lows < 2 * math.pi) & ~numpy.isnan(lows) & ~numpy.isnan(highs)
+    return widen(numpy.where(whole, -1, new_lows), numpy.where(whole, 1, new_highs))
+
+def cos(a):
+    return sin(add(a, (math.pi / 2, math.pi / 2)))
+
+def tan(a):
+    lows, highs = a
+    with numpy.errstate(invalid="ignore"):
+        # intervals around a pole are unbounded
+        pole = (contains_periodic(lows, highs, math.pi / 2, math.pi) | ~(highs - lows < math.pi)) & ~numpy.isnan(lows) & ~numpy.isnan(highs)
+        return widen(numpy.where(pole, -numpy.inf, numpy.tan(lows)), numpy.where(pole, numpy.inf, numpy.tan(highs)))
+
+def cosh(a):
+    a = absolute(a)
+    return widen(numpy.cosh(a[0]), numpy.cosh(a[1]))
+
+def asin(a, decreasing=False):
+    lows, highs = a
+
+    # asin and acos are only defined between -1 and 1
+    outside = (highs < -1) | (lows > 1)
+    with numpy.errstate(invalid="ignore"):
+        lows = numpy.where(outside, numpy.nan, numpy.maximum(lows, -1))
+        highs = numpy.where(outside, numpy.nan, numpy.minimum(highs, 1))
+    if decreasing:
+        return widen(numpy.arccos(highs), numpy.arccos(lows))
+    return widen(numpy.arcsin(lows), numpy.arcsin(highs))
+
+# compile a sympy expression to an interval evaluation, returns None if the expression contains something that can't be evaluated on intervals
+# the compiled evaluation takes the lower and upper bounds of the x intervals and the referenced functions by their names
+def compile_interval(expression):
+    x = sympy.symbols("x")
+    if expression == x:
+        return lambda lows, highs, references: (lows, highs)
+
+    # constants
+    if len(expression.free_symbols) == 0 and not expression.has(AppliedUndef):
+        try:
+            value = float(expression)
+        except:
+            return None
+        return lambda lows, highs, references: widen(numpy.full(lows.shape, value), numpy.full(lows.shape, value))
+
+    # compile the arguments first
+    arguments = [compile_interval(argument) for argument in expression.args]
+    if any(argument is None for argument in arguments):
+        return None
+
+    # references to other functions
+    if isinstance(expression, AppliedUndef):
+        name = expression.func.__name__
+        argument = arguments[0]
+        return lambda lows, highs, references: references[name].get_intervals(*argument(lows, highs, references))
+
+    if isinstance(expression, sympy.Add):
+        def evaluate(lows, highs, references):
+            result = arguments[0](lows, highs, references)
+            for argument in arguments[1:]:
+                result = add(result, argument(lows, highs, references))
+            return result
+        return evaluate
+
+    if isinstance(expression, sympy.Mul):
+        def evaluate(lows, highs, references):
+            result = arguments[0](lows, highs, references)
+            for argument in arguments[1:]:
+                result = multiply(result, argument(lows, highs, references))
+            return result
+        return evaluate
+
+    if isinstance(expression, sympy.Pow):
+        base = arguments[0]
+        if expression.exp.is_Integer:
+            n = int(expression.exp)
+            return lambda lows, highs, references: integer_power(base(lows, highs, references), n)
+        if expression.exp.is_number:
+            try:
+                p = float(expression.exp)
+            except:
+                return None
+            return lambda lows, highs, references: real_power(base(lows, highs, references), p)
+
+        # variable exponents: b^e = exp(e * log(b))
+        exponent = arguments[1]
+        return lambda lows, highs, references: INTERVAL_FUNCTIONS[sympy.exp](
+            multiply(exponent(lows, highs, references), log(base(lows, highs, references))))
+
+    # functions of one argument
+    if expression.func in INTERVAL_FUNCTIONS and len(arguments) == 1:
+        function = INTERVAL_FUNCTIONS[expression.func]
+        argument = arguments[0]
+        return lambda lows, highs, references: function(argument(lows, highs, references))
+
+    return None
+
+# interval evaluations of functions of one argument
+INTERVAL_FUNCTIONS = {sympy.log: log, sympy.sin: sin, sympy.cos: cos, sympy.tan: tan, sympy.Abs: absolute, sympy.cosh: cosh,
+                      sympy.asin: asin, sympy.acos: lambda a: asin(a, True)}
+for sympy_function, numpy_function in INCREASING.items():
+    INTERVAL_FUNCTIONS[sympy_function] = lambda a, numpy_function=numpy_function: widen(numpy_function(a[0]), numpy_function(a[1]))
@@ -8,92 +8,47 @@
 # Function can reference other functions.
 # The graphs are analysed: intersections, zeros, y-intersects, minimums and maximums.
 # The graph can be saved as a file using the s key.
+# Anti-aliasing of the graphs can be toggled using the a key.
+# The functions, the view, the sampled graphs and the special points are saved when the window is closed and restored at the next start.
+# An overlay with the time every part of a frame takes can be toggled using the p key, the l key starts and stops logging every frame to a JSONL file.
 
+# the time to the first frame is measured from before the other modules are imported
+from time import time, perf_counter
+start_time = perf_counter()
+
+import os
+
+# the benchmark starts the plotter with GRAPH_PLOTTER_FIRST_FRAME_ONLY=1, it prints the time to the first frame and quits without saving the session
+FIRST_FRAME_ONLY = os.environ.get("GRAPH_PLOTTER_FIRST_FRAME_ONLY") == "1"
 import pygame
 import datetime
-from time import time
+from Fonts import fonts
+from Function import warm_up
 from RectArea import RectArea
 from Textbox import Textbox
 from GraphPlotter import GraphPlotter
-from StringUtilities import add_missing_brackets, is_standalone, char_exists, char_equals
-
-# function that updates a function
-def update_function(index, text):
-    function = add_missing_brackets(text)
-
-    # replace references to other functions with their values
-    is_error = False
-    for i in range(len(function) - 1, -1, -1):
-        function_no = ord(function[i]) - ord('f')
-        if 0 <= function_no < 10 and is_standalone(function, i) and char_equals(function, i + 1, "("):
-            # check for recursion (if the function is dependent on itself in some way)
-            paths = dependency_paths(index, function_no)
-            for p in paths:
-                for f in p:
-                    graph_plotter.replace_function("Error", f)
-            if len(paths) > 0:
-                is_error = True
-                continue
-
-            # get the text inside the function brackets
-            num_brackets = 1
-            for j in range(i + 2, len(function)):
-                if function[j] == "(":
-                    num_brackets += 1
-                elif function[j] == ")":
-                    num_brackets -= 1
-                    if num_brackets == 0:
-                        break
-
-            if num_brackets == 0 and j != i + 2:
-                # save the dependency
-                if index not in depending_functions[function_no]:
-                    depending_functions[function_no].append(index)
-
-                if not graph_plotter.is_valid_function(function_no):
-                    # if invalid function, replace with error message
-                    is_error = True
-                else:
-                    # pass the input inside the referenced function
-                    function_input = "(" + function[i + 2: j] + ")"
-                    inserted_function = graph_plotter.get_simplified_function(
-                        function_no)
-                    for k in range(len(inserted_function) - 1, -1, -1):
-                        if inserted_function[k] == "x" and is_standalone(inserted_function, k):
-                            inserted_function = inserted_function[:k] + \
-                                function_input + inserted_function[k + 1:]
-
-                    # replace the function with the new one
-                    function = function[:i] + \
-                        "(" + inserted_function + ")" + function[j + 1:]
-
-    graph_plotter.replace_function(function if not is_error else "Error", index)
-
-    # update the depending functions
-    for f in depending_functions[index]:
-        update_function(f, function_strs[f])
-
-# function that checks if there's a dependency path from function a to function b, returns all possible paths
-def dependency_paths(a, b, avoid_functions=[]):
-    if a == b:
-        # trivial case of recursive function
-        return [[a]]
-    else:
-        # check if there's a dependency path from any depending functions to b
-        paths = []
-        for f in depending_functions[a]:
-            if f not in avoid_functions:
-                new_paths = dependency_paths(f, b, avoid_functions + [a])
-                for p in new_paths:
-                    paths.append([a] + p)
-            else:
-                if f == b:
-                    paths.append([a, f])
-        return paths
+from FunctionGraph import FunctionGraph
+from CompileWorker import CompileWorker
+from EvaluationPool import EvaluationPool
+from Session import Session, save_session
+from StringUtilities import add_missing_brackets
 
+# function that compiles an edited function and its depending functions on the compile worker, returns the indices of changed functions
+def compile_edit(index):
+    return function_graph.set_text(index, function_strs[index])
+
+
+# start the worker processes that evaluate expensive functions on all cores before pygame and any threads are started
+# the workers are forked, so the pool isn't used where forking isn't available
+try:
+    evaluation_pool = EvaluationPool()
+except ValueError:
+    evaluation_pool = None
 
 # initialize pygame and the screen with caption "Graph plotter"
+# the installed fonts are looked up while the window is created
 pygame.init()
+fonts.load_system_fonts()
 width = 1000
 height = 800
 screen = pygame.display.set_mode((width, height), pygame.RESIZABLE)
@@ -104,42 +59,208 @@ icon = pygame.image.load("icon.png")
 pygame.display.set_icon(icon)
 
 # create graph plotter for function
-graph_plotter = GraphPlotter(screen, width, height - 80)
+graph_plotter = GraphPlotter(screen, width, height - 80, evaluation_pool)
+
+# show the last session right away with the graphs and points it saved, its functions are compiled in the background
+SESSION_PATH = "session.npz"
+function_strs = ["" for x in range(10)]
+session = None
+if os.path.exists(SESSION_PATH):
+    try:
+        session = Session(SESSION_PATH)
+        session.restore(graph_plotter)
+        function_strs = session.texts
+    except Exception as exception:
+        print("Loading session failed:", exception)
+        session = None
 
 # define graph area and the function textbox
 graph_area = RectArea(0, 0, width, height - 80)
-textbox = Textbox(20, height - 57, width - 40, 34, "f(x) = ",
-                  "", "", graph_plotter.colors[0], False)
+textbox = Textbox(20, height - 57, width - 40, 34, "f(x) = ", add_missing_brackets(function_strs[0]),
+                  graph_plotter.evaluate_function_as_string(0), graph_plotter.colors[0], graph_plotter.is_valid_function(0))
 function_index = 0
-function_strs = ["" for x in range(10)]
 
-# define functions that are referenced by each other
-depending_functions = [[] for x in range(10)]
+# edited functions are compiled on a worker once no key was pressed for DEBOUNCE_TIME seconds
+# the worker keeps its own graph of the newest functions and their references, the graph plotter keeps showing the old ones until they're compiled
+DEBOUNCE_TIME = 0.15
+compile_worker = CompileWorker()
+function_graph = FunctionGraph(graph_plotter.functions)
+edit_times = {}
+
+
+# measure the parts of every frame, the overlay shows the statistics of the functions taken after the last drawn frame
+profiler = graph_plotter.profiler
+profiler.start_time = start_time
+function_statistics = {}
+overlay_rect = None
+overlay_time = 0
 
 # main loop
-frames = 0
-last_time = time()
 clock = pygame.time.Clock()
-while True:
-    graph_plotter.draw_graphs()
 
-    # draw bar at the bottom of the screen separated by a thin grey line
-    pygame.draw.rect(screen, (255, 255, 255), (0, height - 80, width, 80))
-    pygame.draw.line(screen, (180, 180, 180),
-                     (0, height - 80), (width, height - 80), 1)
+# save what has to be redrawn, nothing is drawn if nothing changed
+graphs_changed = True
+bar_changed = True
+cursor_visible = textbox.is_cursor_visible()
 
-    # draw function box and name
-    textbox.draw(screen)
+# save the graphs without the hovered point to remove the point again without redrawing the graphs
+graphs_background = None
+hovered_point = None
+hovered_rect = None
+first_frame = True
+while True:
+    profiler.start_frame()
+
+    # redraw the graphs while the animation is running
+    if graph_plotter.animation_speed != 0:
+        graphs_changed = True
+
+    # redraw the bar if the cursor blinked
+    if textbox.is_cursor_visible() != cursor_visible:
+        bar_changed = True
+
+    # compile functions that weren't edited for a while
+    for index, edit_time in list(edit_times.items()):
+        if time() - edit_time > DEBOUNCE_TIME:
+            compile_worker.submit(index, lambda index=index: compile_edit(index))
+            del edit_times[index]
+
+    # show compiled functions and analyse them again
+    results = compile_worker.get_results()
+    compiled = False
+    for key, result in results:
+        # tiles of the session that are valid for the compiled functions
+        if key == "session tiles":
+            session.add_tiles(graph_plotter, result)
+            session = None
+            continue
+
+        # importing sympy doesn't change any function
+        if key == "warm up":
+            continue
+
+        for f in result:
+            graph_plotter.set_function(function_graph.functions[f], f)
+        compiled = True
+    if compiled:
+        with profiler.measure("analysis"):
+            graph_plotter.analyse_graphs()
 
-    pygame.display.flip()
+        # if function is a constant, pass it to textbox
+        textbox.added_text = graph_plotter.evaluate_function_as_string(
+            function_index)
+
+        # pass validness of function to textbox
+        textbox.is_valid = graph_plotter.is_valid_function(function_index)
+        graphs_changed = True
+
+    # rects of the screen that were drawn on
+    dirty_rects = []
+
+    # add special points of finished analyses, fade in the hovered point until it's fully visible
+    with profiler.measure("analysis"):
+        graph_plotter.update_special_points()
+    with profiler.measure("hover"):
+        new_hovered_point = graph_plotter.get_hovered_point(pygame.mouse.get_pos())
+        fading = new_hovered_point is not None and graph_plotter.get_point_opacity(
+            new_hovered_point) < 1
+
+    if graphs_changed:
+        graph_plotter.draw_graphs()
+        graphs_background = screen.subsurface((0, 0, width, height - 80)).copy()
+        hovered_point = None
+        hovered_rect = None
+        bar_changed = True
+        dirty_rects.append(screen.get_rect())
+    with profiler.measure("hover"):
+        # remove the previous hovered point, the point was already removed if the graphs were drawn again
+        if (new_hovered_point is not hovered_point or fading) and hovered_rect is not None:
+            screen.blit(graphs_background, hovered_rect, hovered_rect)
+            dirty_rects.append(hovered_rect)
+            hovered_rect = None
+
+        # draw special point with most descriptions if mouse is hovered close to it
+        if new_hovered_point is not None and hovered_rect is None:
+            screen.set_clip((0, 0, width, height - 80))
+            hovered_rect = graph_plotter.draw_special_point(
+                new_hovered_point).clip(screen.get_clip())
+            screen.set_clip(None)
+
+            # draw the graphs above the point transparently while it fades in
+            if fading:
+                graphs_above = graphs_background.subsurface(hovered_rect).copy()
+                graphs_above.set_alpha(
+                    int(255 * (1 - graph_plotter.get_point_opacity(new_hovered_point))))
+                screen.blit(graphs_above, hovered_rect)
+            dirty_rects.append(hovered_rect)
+    hovered_point = new_hovered_point
+
+    if bar_changed:
+        with profiler.measure("textbox"):
+            cursor_visible = textbox.is_cursor_visible()
+
+            # draw bar at the bottom of the screen separated by a thin grey line
+            pygame.draw.rect(screen, (255, 255, 255), (0, height - 80, width, 80))
+            pygame.draw.line(screen, (180, 180, 180),
+                             (0, height - 80), (width, height - 80), 1)
+
+            # draw function box and name
+            textbox.draw(screen)
+            dirty_rects.append(pygame.Rect(0, height - 80, width, 80))
+
+    # draw the overlay above the graphs with every drawn frame, but at least four times per second
+    if profiler.overlay_visible and (len(dirty_rects) > 0 or time() - overlay_time > 0.25):
+        if overlay_rect is not None and not graphs_changed:
+            screen.blit(graphs_background, overlay_rect, overlay_rect)
+            dirty_rects.append(overlay_rect)
+        overlay_rect = profiler.draw_overlay(screen, function_statistics, graph_plotter.analysis_statistics).clip(
+            pygame.Rect(0, 0, width, height - 80))
+        dirty_rects.append(overlay_rect)
+        overlay_time = time()
+
+    # only update the parts of the screen that changed
+    with profiler.measure("flip"):
+        if graphs_changed:
+            pygame.display.flip()
+        elif len(dirty_rects) > 0:
+            pygame.display.update(dirty_rects)
+
+    # log the frame if something was drawn
+    if len(dirty_rects) > 0:
+        function_statistics = graph_plotter.get_function_statistics()
+    profiler.end_frame(len(dirty_rects) > 0, function_statistics, graph_plotter.analysis_statistics)
+    graphs_changed = False
+    bar_changed = False
+
+    # start compiling once the first frame is shown, so it doesn't slow the first frame down
+    # the functions of the session are compiled at once, then its tiles are checked against the compiled functions
+    # without a session, sympy is imported, so the first typed function compiles fast
+    if first_frame and profiler.first_frame_time is not None:
+        if FIRST_FRAME_ONLY:
+            print(profiler.first_frame_time)
+            if evaluation_pool is not None:
+                evaluation_pool.close()
+            pygame.quit()
+            quit()
+        if session is not None:
+            compile_worker.submit("session", lambda: function_graph.set_texts(function_strs))
+            compile_worker.submit("session tiles", lambda: session.validate(function_graph.functions))
+        else:
+            compile_worker.submit("warm up", warm_up)
+        first_frame = False
 
     for event in pygame.event.get():
         if event.type == pygame.MOUSEBUTTONDOWN:
             # check for mouse wheel event and zoom in or out
             if event.button == 4:
                 graph_plotter.zoom_in(event.pos)
+                graphs_changed = True
             elif event.button == 5:
                 graph_plotter.zoom_out(event.pos)
+                graphs_changed = True
+
+            # a click can move the cursor of the textbox
+            bar_changed = True
 
         # if left mouse button is released, set cursor to arrow
         elif event.type == pygame.MOUSEBUTTONUP:
@@ -151,20 +272,42 @@ while True:
             # only drag if mouse is on the graph area
             if event.buttons[0] == 1 and graph_area.contains(event.pos):
                 graph_plotter.move(event.rel)
+                graphs_changed = True
 
         # if space bar is pressed, start or stop animation
         elif event.type == pygame.KEYDOWN:
+            # a key can change the text or move the cursor of the textbox
+            bar_changed = True
+
             if event.key == pygame.K_SPACE and not textbox.active:
                 if graph_plotter.animation_speed == 0:
                     graph_plotter.start_animation()
                 else:
                     graph_plotter.stop_animation()
+                graphs_changed = True
 
             # if s is pressed, save the current graph to a file
             elif event.key == pygame.K_s and not textbox.active:
                 pygame.image.save(screen, "Screenshots/Screenshot_" +
                                   datetime.datetime.now().strftime(r"%d_%m_%Y_%H_%M_%S") + ".png")
 
+            # if a is pressed, toggle anti-aliasing of the graphs
+            elif event.key == pygame.K_a and not textbox.active:
+                graph_plotter.anti_aliasing = not graph_plotter.anti_aliasing
+                graphs_changed = True
+
+            # if p is pressed, toggle the profiling overlay
+            elif event.key == pygame.K_p and not textbox.active:
+                profiler.overlay_visible = not profiler.overlay_visible
+                overlay_rect = None
+                graphs_changed = True
+
+            # if l is pressed, start or stop logging every frame to a file
+            elif event.key == pygame.K_l and not textbox.active:
+                os.makedirs("Logs", exist_ok=True)
+                profiler.toggle_log("Logs/Profile_" +
+                                    datetime.datetime.now().strftime(r"%d_%m_%Y_%H_%M_%S") + ".jsonl")
+
             # if down button is pressed, load the next function
             elif event.key == pygame.K_DOWN:
                 # only load the next function if limit of functions hasn't been reached
@@ -174,7 +317,7 @@ while True:
                     # get function name based on index, starting at f, g, h, ...
                     function = add_missing_brackets(
                         function_strs[function_index])
-                    textbox = Textbox(20, height - 57, width - 40, 34, chr(ord('f') + function_index) + "(x) = ", function, graph_plotter.evaluate_function_as_string(
+                    textbox.load(chr(ord('f') + function_index) + "(x) = ", function, graph_plotter.evaluate_function_as_string(
                         function_index), graph_plotter.colors[function_index], graph_plotter.is_valid_function(function_index))
 
             # if up button is pressed, load the previous function
@@ -186,7 +329,7 @@ while True:
                     # get function name based on index, starting at f, g, h, ...
                     function = add_missing_brackets(
                         function_strs[function_index])
-                    textbox = Textbox(20, height - 57, width - 40, 34, chr(ord('f') + function_index) + "(x) = ", function, graph_plotter.evaluate_function_as_string(
+                    textbox.load(chr(ord('f') + function_index) + "(x) = ", function, graph_plotter.evaluate_function_as_string(
                         function_index), graph_plotter.colors[function_index], graph_plotter.is_valid_function(function_index))
 
         # resize the graph plotter if the window is resized
@@ -203,24 +346,27 @@ while True:
 
             # change textbox position
             textbox.resize(20, height - 57, width - 40, 34)
+            graphs_changed = True
+
+        # redraw everything if the window has to be drawn again
+        elif event.type == pygame.VIDEOEXPOSE:
+            graphs_changed = True
 
         if event.type == pygame.QUIT:
+            try:
+                save_session(SESSION_PATH, function_strs, graph_plotter)
+            except OSError as exception:
+                print("Saving session failed:", exception)
+            if evaluation_pool is not None:
+                evaluation_pool.close()
             pygame.quit()
             quit()
 
         # let the textbox handle the event and refresh functions if changed
+        # the function is compiled after the typing paused
         if textbox.handle_event(event):
-            update_function(function_index, textbox.text)
-
             function_strs[function_index] = textbox.text
-            graph_plotter.analyse_graphs()
-
-            # if function is a constant, pass it to textbox
-            textbox.added_text = graph_plotter.evaluate_function_as_string(
-                function_index)
-
-            # pass validness of function to textbox
-            textbox.is_valid = graph_plotter.is_valid_function(function_index)
+            edit_times[function_index] = time()
 
     # if the mouse is over the graph area, change the cursor to hand, if it's over the textbox, change the cursor to ibeam, else to arrow
     if graph_area.contains(pygame.mouse.get_pos()):
@@ -230,13 +376,4 @@ while True:
     else:
         pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
 
-    # update the frames and time, output log
-    frames += 1
-    if time() - last_time > 1:
-        graph_plotter.print_cache_info()
-        print(f"FPS: {int(frames / (time() - last_time))}")
-        print()
-        last_time = time()
-        frames = 0
-
     clock.tick(75)
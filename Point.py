@@ -0,0 +1,29 @@
+# class for points
+class Point:
+    def __init__(self, x, y, index, description):
+        # convert -0 to 0
+        self.x = x if x != 0 else 0
+        self.y = y if y != 0 else 0
+        self.index = index
+        self.descriptions = [description]
+
+        # time the point was added to the graph plotter
+        self.added_time = None
+
+    # add point to point if same x values
+    def add_point(self, x, index, description):
+        # check if point has same x value
+        if index == self.index and x == self.x:
+            # insert description alphabetically
+            if description not in self.descriptions:
+                added = False
+                for i in range(len(self.descriptions)):
+                    if description < self.descriptions[i]:
+                        self.descriptions.insert(i, description)
+                        added = True
+                        break
+                if not added:
+                    self.descriptions.append(description)
+            
+            return True
+        return False
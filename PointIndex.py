@@ -0,0 +1,75 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+
+# class for the special points of all graphs
+# points are saved by function index and x value to find duplicates fast, sorted by x value to remove points outside of a range,
+# and in a grid of cells to find points close to a position fast
+class PointIndex:
+    def __init__(self):
+        self.points = {}
+        self.keys = []
+
+        # grid of cells with the points inside them, the size of a cell in units
+        self.cells = {}
+        self.cell_size = None
+
+    def __iter__(self):
+        return iter(self.points.values())
+
+    def __len__(self):
+        return len(self.points)
+
+    # add point, merge it with a point of the same function with the same x value
+    def add(self, point):
+        p = self.points.get((point.index, point.x))
+        if p is not None:
+            for description in point.descriptions:
+                p.add_point(point.x, point.index, description)
+            return
+
+        self.points[(point.index, point.x)] = point
+        insort(self.keys, (point.x, point.index))
+        if self.cell_size is not None:
+            self.cells.setdefault(self.get_cell(point.x, point.y), []).append(point)
+
+    # remove all points
+    def clear(self):
+        self.points = {}
+        self.keys = []
+        self.cells = {}
+
+    # remove all points with x values outside of the range
+    def remove_outside(self, min_x, max_x):
+        start = bisect_left(self.keys, (min_x, -1))
+        end = bisect_right(self.keys, (max_x, math.inf))
+        for x, index in self.keys[:start] + self.keys[end:]:
+            point = self.points.pop((index, x))
+            if self.cell_size is not None:
+                self.cells[self.get_cell(point.x, point.y)].remove(point)
+        self.keys = self.keys[start:end]
+
+    # get the cell of a position
+    def get_cell(self, x, y):
+        return (math.floor(x / self.cell_size[0]), math.floor(y / self.cell_size[1]))
+
+    # return all points closer to the position than the distances in x and y direction
+    def get_close_points(self, x, y, distance_x, distance_y):
+        # sort points into cells again if the cells are too small or too big for the distances
+        cell_size = (2 * distance_x, 2 * distance_y)
+        if self.cell_size is None or not math.isclose(self.cell_size[0], cell_size[0], rel_tol=1e-9) \
+                or not math.isclose(self.cell_size[1], cell_size[1], rel_tol=1e-9):
+            self.cell_size = cell_size
+            self.cells = {}
+            for point in self.points.values():
+                self.cells.setdefault(self.get_cell(point.x, point.y), []).append(point)
+
+        # close points can only be in the cell of the position or its neighbours
+        cell_x, cell_y = self.get_cell(x, y)
+        close_points = []
+        for i in range(cell_x - 1, cell_x + 2):
+            for j in range(cell_y - 1, cell_y + 2):
+                for point in self.cells.get((i, j), []):
+                    if abs(point.x - x) < distance_x and abs(point.y - y) < distance_y:
+                        close_points.append(point)
+
+        return close_points
@@ -0,0 +1,126 @@
+import json
+import pygame
+from time import time, perf_counter
+from contextlib import contextmanager
+from Fonts import fonts
+
+# number of frames the times of the overlay are averaged over
+AVERAGE_FRAMES = 60
+
+# class for measuring how long the parts of a frame take, shows the times in an overlay and writes every frame to a JSONL log
+class Profiler:
+    def __init__(self):
+        # times of the parts of the current frame in seconds, by their name
+        self.times = {}
+        self.frame_start = perf_counter()
+        self.frame_count = 0
+
+        # drawn frames per second, counted every second
+        self.fps = 0
+        self.fps_frames = 0
+        self.fps_time = time()
+
+        # times of the last frames, newest last
+        self.history = []
+
+        self.overlay_visible = False
+
+        # time the program started and seconds from then until the first frame was drawn, measured if the start is set
+        self.start_time = None
+        self.first_frame_time = None
+
+        # file the frames are written to, None if logging is off
+        self.log = None
+
+    # add the time of a part of the frame, parts measured more than once in a frame are added up
+    def add_time(self, name, duration):
+        self.times[name] = self.times.get(name, 0) + duration
+
+    # measure the time of the code in a with statement
+    @contextmanager
+    def measure(self, name):
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start_time)
+
+    # start measuring a new frame
+    def start_frame(self):
+        self.times = {}
+        self.frame_start = perf_counter()
+
+    # finish the current frame, frames that drew nothing are neither logged nor shown
+    # statistics are the function statistics of the graph plotter and the statistics of the last analysis
+    def end_frame(self, drawn, function_statistics=None, analysis_statistics=None):
+        # count drawn frames per second
+        if time() - self.fps_time > 1:
+            self.fps = int(self.fps_frames / (time() - self.fps_time))
+            self.fps_frames = 0
+            self.fps_time = time()
+
+        if not drawn:
+            return
+        self.fps_frames += 1
+        self.times["frame"] = perf_counter() - self.frame_start
+        if self.first_frame_time is None and self.start_time is not None:
+            self.first_frame_time = perf_counter() - self.start_time
+        self.frame_count += 1
+
+        self.history.append(self.times)
+        if len(self.history) > AVERAGE_FRAMES:
+            self.history.pop(0)
+
+        if self.log is not None:
+            self.log.write(json.dumps({
+                "frame": self.frame_count,
+                "time": time(),
+                "times": {name: round(duration * 1000, 4) for name, duration in self.times.items()},
+                "functions": function_statistics or {},
+                "analysis": analysis_statistics,
+                "first_frame": self.first_frame_time,
+            }) + "\n")
+
+    # start writing frames to a file, stop if it's already writing
+    def toggle_log(self, path):
+        if self.log is None:
+            self.log = open(path, "a")
+        else:
+            self.log.close()
+            self.log = None
+
+    # get the average time of every part over the last frames in milliseconds
+    def get_average_times(self):
+        totals = {}
+        for times in self.history:
+            for name, duration in times.items():
+                totals[name] = totals.get(name, 0) + duration
+        return {name: total / len(self.history) * 1000 for name, total in totals.items()}
+
+    # draw the average times and the function statistics in the top left corner, returns the rect that was drawn on
+    def draw_overlay(self, screen, function_statistics, analysis_statistics):
+        lines = [f"FPS: {self.fps}"]
+        if self.first_frame_time is not None:
+            lines.append(f"first frame: {self.first_frame_time * 1000:.0f} ms")
+        lines += [f"{name}: {duration:.2f} ms" for name, duration in self.get_average_times().items()]
+        for name, statistics in function_statistics.items():
+            lines.append(f"{name}: {statistics['evaluations']} evaluations, {statistics['hit_rate']:.1f}% hits, "
+                         f"{statistics['tiles']} tiles, {statistics['bytes'] / 1024:.1f} kB")
+        if analysis_statistics is not None:
+            lines.append(f"analysis: {analysis_statistics['brackets']} brackets, {analysis_statistics['iterations']} iterations, "
+                         f"{analysis_statistics['evaluations']} evaluations, {analysis_statistics['time'] * 1000:.1f} ms")
+
+        texts = [fonts.get("Consolas", 13).render(line, True, (255, 255, 255)) for line in lines]
+        width = max([text.get_width() for text in texts], default=0) + 10
+        height = sum(text.get_height() for text in texts) + 10
+
+        # draw the lines on a transparent black background
+        background = pygame.Surface((width, height), pygame.SRCALPHA)
+        background.fill((0, 0, 0, 180))
+        screen.blit(background, (5, 5))
+        y = 10
+        for text in texts:
+            screen.blit(text, (10, y))
+            y += text.get_height()
+
+        return pygame.Rect(5, 5, width, height)
@@ -0,0 +1,211 @@
+import math
+import numpy
+from collections import OrderedDict
+from AdaptiveSampler import sample_adaptive
+
+# number of samples in one tile
+TILE_SIZE = 256
+
+# memory budget of the sample cache shared by all functions in bytes
+MAX_BYTES = 32 * 1024 * 1024
+
+# number of samples in one pixel column of an envelope
+SUPERSAMPLING = 16
+
+# number of y scale levels per factor of two, adaptively sampled tiles are reused while the y scale stays in one level
+Y_LEVELS = 4
+
+# class for a cache of sampled function values, split into tiles of fixed size
+# a tile is identified by its function, its zoom level and its index, so the tiles stay valid when the screen is moved
+class SampleCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+
+        # tiles in order of last use, oldest first
+        self.tiles = OrderedDict()
+
+        # hits and misses of every function
+        self.stats = {}
+
+    # get the spacing between two samples of a zoom level
+    def get_spacing(self, level):
+        return 2.0 ** level
+
+    # get the zoom level with the biggest spacing that is at most the given step
+    def get_level(self, step):
+        return math.floor(math.log2(step))
+
+    # get the x values of a tile
+    def get_tile_xs(self, level, tile):
+        return (tile * TILE_SIZE + numpy.arange(TILE_SIZE)) * self.get_spacing(level)
+
+    # get a cached value of a function, compute and save it if it's not in the cache
+    def get(self, function, key, compute):
+        stats = self.stats.setdefault(function.id, [0, 0])
+
+        value = self.tiles.get((function.id,) + key)
+        if value is not None:
+            # mark tile as recently used
+            self.tiles.move_to_end((function.id,) + key)
+            stats[0] += 1
+            return value
+
+        stats[1] += 1
+        value = compute()
+        self.add(function, key, value)
+        return value
+
+    # check if a value of a function is cached
+    def contains(self, function, key):
+        return (function.id,) + key in self.tiles
+
+    # save a value of a function that was computed elsewhere
+    def add(self, function, key, value):
+        key = (function.id,) + key
+        if key in self.tiles:
+            self.bytes_used -= self.get_size(self.tiles[key])
+        self.tiles[key] = value
+        self.bytes_used += self.get_size(value)
+
+        # remove least recently used tiles until the cache fits into the memory budget
+        while self.bytes_used > self.max_bytes and len(self.tiles) > 1:
+            old_key, old_value = self.tiles.popitem(last=False)
+            self.bytes_used -= self.get_size(old_value)
+
+    # get the number of bytes of a cached value
+    def get_size(self, value):
+        return sum(array.nbytes for array in value) if isinstance(value, tuple) else value.nbytes
+
+    # get the function that evaluates the samples, precise samples are cached separately
+    def get_evaluate(self, function, precise):
+        return function.get_precise_values if precise else function.get_values
+
+    # get the y values of a tile
+    def get_tile(self, function, level, tile, precise=False):
+        return self.get(function, (level, tile, precise), lambda: self.get_evaluate(function, precise)(self.get_tile_xs(level, tile)))
+
+    # get the x and y values of an adaptively refined tile, including the interval to the next tile
+    def get_refined_tile(self, function, level, tile, y_level, precise=False):
+        def compute():
+            xs = numpy.append(self.get_tile_xs(level, tile), (tile + 1) * TILE_SIZE * self.get_spacing(level))
+            ys = numpy.append(self.get_tile(function, level, tile, precise), self.get_tile(function, level, tile + 1, precise)[0])
+            xs, ys = sample_adaptive(self.get_evaluate(function, precise), xs, ys, 2.0 ** (y_level / Y_LEVELS))
+
+            # the last sample belongs to the next tile
+            return xs[:-1], ys[:-1]
+
+        return self.get(function, (level, tile, y_level, precise), compute)
+
+    # get the lowest and highest values of every column of an envelope tile, a column ends with the first sample of the next column
+    def get_envelope_tile(self, function, level, tile):
+        def compute():
+            xs = (tile * TILE_SIZE + numpy.arange(TILE_SIZE * SUPERSAMPLING + 1) / SUPERSAMPLING) * self.get_spacing(level)
+            ys = function.get_values(xs)
+            columns = numpy.column_stack((ys[:-1].reshape(TILE_SIZE, SUPERSAMPLING), ys[SUPERSAMPLING::SUPERSAMPLING]))
+
+            # undefined samples are ignored, columns without defined samples stay undefined
+            return numpy.fmin.reduce(columns, axis=1), numpy.fmax.reduce(columns, axis=1)
+
+        return self.get(function, (level, tile, "envelope"), compute)
+
+    # get the start x of the columns between min_x and max_x with width of at most pixel and the lowest and highest value in every column
+    def get_envelope(self, function, min_x, max_x, pixel):
+        level = self.get_level(pixel)
+        spacing = self.get_spacing(level)
+
+        # indices of the first and last column that cover the range
+        first = math.floor(min_x / spacing)
+        last = math.floor(max_x / spacing)
+        if last < first:
+            return numpy.empty(0), numpy.empty(0), numpy.empty(0)
+
+        first_tile = first // TILE_SIZE
+        last_tile = last // TILE_SIZE
+        tiles = [self.get_envelope_tile(function, level, tile) for tile in range(first_tile, last_tile + 1)]
+
+        # cut the tiles to the range
+        offset = first - first_tile * TILE_SIZE
+        lows = numpy.concatenate([tile[0] for tile in tiles])[offset:offset + last - first + 1]
+        highs = numpy.concatenate([tile[1] for tile in tiles])[offset:offset + last - first + 1]
+        return numpy.arange(first, last + 1) * spacing, lows, highs
+
+    # compute the tiles of the functions between min_x and max_x that aren't cached yet with one call of evaluate_many
+    # evaluate_many takes a list of functions and x values and returns the values of all of them, so they can be evaluated in parallel
+    # if evaluate_many returns None, nothing is cached and the tiles are computed when they're drawn
+    def prefetch(self, functions, min_x, max_x, step, precise, evaluate_many):
+        level = self.get_level(step)
+        spacing = self.get_spacing(level)
+
+        # adaptively refined tiles need the first value of the next tile as well
+        first_tile = math.floor(min_x / spacing) // TILE_SIZE
+        last_tile = math.ceil(max_x / spacing) // TILE_SIZE + 1
+        missing = [(function, (level, tile, precise)) for function in functions for tile in range(first_tile, last_tile + 1)
+                   if not self.contains(function, (level, tile, precise))]
+        if len(missing) == 0:
+            return
+
+        values = evaluate_many([(function, self.get_tile_xs(level, key[1])) for function, key in missing])
+        if values is None:
+            return
+        for (function, key), value in zip(missing, values):
+            self.add(function, key, value)
+
+    # get x and y values of a function between min_x and max_x, with spacing of at most step
+    # if y_scale is given, the samples are refined so the line is at most half a pixel away from the curve
+    # if precise is set, the samples are evaluated with mpmath
+    def get_samples(self, function, min_x, max_x, step, y_scale=None, precise=False):
+        level = self.get_level(step)
+        spacing = self.get_spacing(level)
+
+        # indices of the first and last sample that cover the range
+        first = math.floor(min_x / spacing)
+        last = math.ceil(max_x / spacing)
+        if last < first:
+            return numpy.empty(0), numpy.empty(0)
+
+        first_tile = first // TILE_SIZE
+        last_tile = last // TILE_SIZE
+
+        if y_scale is None:
+            ys = numpy.concatenate([self.get_tile(function, level, tile, precise)
+                                    for tile in range(first_tile, last_tile + 1)])
+
+            # cut the tiles to the range
+            offset = first - first_tile * TILE_SIZE
+            ys = ys[offset:offset + last - first + 1]
+            xs = numpy.arange(first, last + 1) * spacing
+        else:
+            y_level = math.floor(math.log2(y_scale) * Y_LEVELS)
+            tiles = [self.get_refined_tile(function, level, tile, y_level, precise)
+                     for tile in range(first_tile, last_tile + 1)]
+            xs = numpy.concatenate([tile[0] for tile in tiles])
+            ys = numpy.concatenate([tile[1] for tile in tiles])
+
+            # cut the tiles to the range
+            start = numpy.searchsorted(xs, first * spacing)
+            end = numpy.searchsorted(xs, last * spacing, side="right")
+            xs = xs[start:end]
+            ys = ys[start:end]
+
+        return xs, ys
+
+    # remove all tiles of a function
+    def discard(self, function):
+        for key in [key for key in self.tiles if key[0] == function.id]:
+            self.bytes_used -= self.get_size(self.tiles.pop(key))
+        self.stats.pop(function.id, None)
+
+    # return the keys without the function id and the values of all tiles of a function
+    def get_tiles(self, function):
+        return [(key[1:], value) for key, value in self.tiles.items() if key[0] == function.id]
+
+    # return number of tiles, hits, misses and bytes used by a function
+    def get_info(self, function):
+        tiles = [value for key, value in self.tiles.items() if key[0] == function.id]
+        hits, misses = self.stats.get(function.id, [0, 0])
+        return len(tiles), hits, misses, sum(self.get_size(value) for value in tiles)
+
+
+# sample cache shared by all functions
+sample_cache = SampleCache(MAX_BYTES)
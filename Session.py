@@ -0,0 +1,144 @@
+# module for saving the state of the graph plotter to a session file and restoring it at the next start
+# the session is one uncompressed .npz file: the function texts, the view, the cached sample tiles and the special points are stored as flat arrays
+import os
+import numpy
+from Point import Point
+from Function import Function
+from SampleCache import sample_cache, TILE_SIZE
+
+# number of values of every restored tile that are compared with the compiled function
+VALIDATION_SAMPLES = 8
+
+# function restored from a session that is shown until it's compiled again, only the cached samples of the session are known
+# values that weren't cached are undefined
+class RestoredFunction(Function):
+    def __init__(self, string, value):
+        super().__init__("Error")
+        self.string = string
+        self.value = value
+        self.function = lambda x: numpy.full(numpy.shape(x), numpy.nan)
+
+# save the function texts, the view, the cached tiles of all functions and the special points of the graph plotter to a file
+# the file is written next to the path first, so a session isn't lost if saving fails
+def save_session(path, function_strs, graph_plotter):
+    functions = graph_plotter.functions
+    arrays = {
+        "texts": numpy.array(function_strs, dtype=str),
+        "strings": numpy.array([function.string for function in functions], dtype=str),
+        "valid": numpy.array([function.is_valid() for function in functions]),
+        "values": numpy.array([numpy.nan if function.value is None else float(function.value) for function in functions]),
+        "view": numpy.array([graph_plotter.min_x, graph_plotter.max_x, graph_plotter.min_y, graph_plotter.max_y]),
+        "analysed": numpy.array([graph_plotter.analysed_min_x, graph_plotter.analysed_max_x]),
+    }
+
+    # tiles are sorted by their kind, keys start with the index of the function
+    # values of refined tiles have different lengths, they're concatenated and split again at the offsets
+    tiles, refined, envelopes = [], [], []
+    for index, function in enumerate(functions):
+        for key, value in sample_cache.get_tiles(function):
+            if key[-1] == "envelope":
+                envelopes.append(((index,) + key[:-1], value))
+            elif len(key) == 3:
+                tiles.append(((index,) + key, value))
+            else:
+                refined.append(((index,) + key, value))
+
+    arrays["tile_keys"] = numpy.array([key for key, value in tiles], dtype=numpy.int64).reshape(-1, 4)
+    arrays["tile_values"] = numpy.array([value for key, value in tiles]).reshape(-1, TILE_SIZE)
+    arrays["refined_keys"] = numpy.array([key for key, value in refined], dtype=numpy.int64).reshape(-1, 5)
+    arrays["refined_offsets"] = numpy.cumsum([0] + [len(value[0]) for key, value in refined])
+    arrays["refined_xs"] = numpy.concatenate([value[0] for key, value in refined] + [numpy.empty(0)])
+    arrays["refined_ys"] = numpy.concatenate([value[1] for key, value in refined] + [numpy.empty(0)])
+    arrays["envelope_keys"] = numpy.array([key for key, value in envelopes], dtype=numpy.int64).reshape(-1, 3)
+    arrays["envelope_values"] = numpy.array([value for key, value in envelopes]).reshape(-1, 2, TILE_SIZE)
+
+    points = list(graph_plotter.special_points)
+    arrays["point_coordinates"] = numpy.array([(point.x, point.y) for point in points], dtype=float).reshape(-1, 2)
+    arrays["point_indices"] = numpy.array([point.index for point in points], dtype=numpy.int64)
+    arrays["point_descriptions"] = numpy.array(["\n".join(point.descriptions) for point in points], dtype=str)
+
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        numpy.savez(file, **arrays)
+    os.replace(temporary_path, path)
+
+# class for a session loaded from a file
+# the session is shown right away with restored functions, the tiles are checked against the compiled functions later
+class Session:
+    def __init__(self, path):
+        with numpy.load(path) as data:
+            self.texts = data["texts"].tolist()
+            self.strings = data["strings"].tolist()
+            self.valid = data["valid"].tolist()
+            self.values = data["values"].tolist()
+            self.view = data["view"].tolist()
+            self.analysed = data["analysed"].tolist()
+
+            # tiles as (function index, key, value) with the same keys as in the sample cache
+            self.tiles = [(int(key[0]), (int(key[1]), int(key[2]), bool(key[3])), value)
+                          for key, value in zip(data["tile_keys"], data["tile_values"])]
+            offsets = data["refined_offsets"]
+            xs, ys = data["refined_xs"], data["refined_ys"]
+            self.tiles += [(int(key[0]), (int(key[1]), int(key[2]), int(key[3]), bool(key[4])), (xs[start:end], ys[start:end]))
+                           for key, start, end in zip(data["refined_keys"], offsets[:-1], offsets[1:])]
+            self.tiles += [(int(key[0]), (int(key[1]), int(key[2]), "envelope"), (value[0], value[1]))
+                           for key, value in zip(data["envelope_keys"], data["envelope_values"])]
+
+            self.points = list(zip(data["point_coordinates"].tolist(), data["point_indices"].tolist(),
+                                   data["point_descriptions"].tolist()))
+
+    # show the session on the graph plotter before the functions are compiled
+    # valid functions are replaced by restored functions with the cached tiles, the special points are visible right away
+    def restore(self, graph_plotter):
+        graph_plotter.set_view(*self.view)
+        graph_plotter.analysed_min_x, graph_plotter.analysed_max_x = self.analysed
+
+        for index in range(len(graph_plotter.functions)):
+            if self.valid[index]:
+                value = None if numpy.isnan(self.values[index]) else self.values[index]
+                graph_plotter.set_function(RestoredFunction(self.strings[index], value), index)
+        for index, key, value in self.tiles:
+            sample_cache.add(graph_plotter.functions[index], key, value)
+
+        for (x, y), index, descriptions in self.points:
+            descriptions = descriptions.split("\n")
+            point = Point(x, y, index, descriptions[0])
+            for description in descriptions[1:]:
+                point.add_point(x, index, description)
+            point.added_time = 0
+            graph_plotter.special_points.add(point)
+
+    # check the tiles against the compiled functions, returns the tiles that are still valid with their function
+    # a few values of every tile are evaluated again, tiles of functions whose normalized string changed are left out
+    def validate(self, functions):
+        valid_tiles = []
+        for index, key, value in self.tiles:
+            function = functions[index]
+            if not function.is_valid() or function.string != self.strings[index]:
+                continue
+
+            # xs and ys of the values that are compared, envelope columns contain the value at their start
+            level, tile = key[0], key[1]
+            if key[-1] == "envelope":
+                xs = sample_cache.get_tile_xs(level, tile)
+                lows, highs = value
+            elif len(key) == 3:
+                xs = sample_cache.get_tile_xs(level, tile)
+                lows = highs = value
+            else:
+                xs = value[0]
+                lows = highs = value[1]
+            samples = numpy.linspace(0, len(xs) - 1, min(VALIDATION_SAMPLES, len(xs))).astype(int)
+            precise = key[-1] is True
+            ys = function.get_precise_values(xs[samples]) if precise else function.get_values(xs[samples])
+
+            inside = (ys >= lows[samples] - 1e-9 * numpy.abs(lows[samples])) & (ys <= highs[samples] + 1e-9 * numpy.abs(highs[samples]))
+            if numpy.all(inside | numpy.isnan(ys) & numpy.isnan(lows[samples])):
+                valid_tiles.append((index, function, key, value))
+        return valid_tiles
+
+    # add the valid tiles to the sample cache, tiles of functions that were changed since they were validated are left out
+    def add_tiles(self, graph_plotter, valid_tiles):
+        for index, function, key, value in valid_tiles:
+            if graph_plotter.functions[index] is function:
+                sample_cache.add(function, key, value)
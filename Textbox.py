@@ -2,6 +2,7 @@ import pygame
 import pygame.gfxdraw
 import string
 from time import time
+from Fonts import fonts
 from RectArea import RectArea
 
 # class for a pygame textbox
@@ -18,8 +19,16 @@ class Textbox:
         self.color = color
         self.is_valid = is_valid
 
-        self.font = pygame.font.SysFont("Roboto", 26)
-        self.number_font = pygame.font.SysFont("Arial", 18)
+        self.active = True
+        self.cursor_pos = len(text)
+
+    # show another function in the textbox
+    def load(self, default_text, text, added_text, color, is_valid):
+        self.default_text = default_text
+        self.text = text
+        self.added_text = added_text
+        self.color = color
+        self.is_valid = is_valid
         self.active = True
         self.cursor_pos = len(text)
 
@@ -66,7 +75,7 @@ class Textbox:
             self.active = self.area.contains(event.pos)
 
             # set cursor position to the position of the mouse
-            text1 = self.font.render(self.default_text, True, (0, 0, 0))
+            text1 = fonts.get("Roboto", 26).render(self.default_text, True, (0, 0, 0))
             rect1 = text1.get_rect()
             rect1.x = self.x + 30
             rect1.centery = self.y + self.height / 2
@@ -75,7 +84,7 @@ class Textbox:
             self.cursor_pos = len(self.text)
             pos = rect1.right
             for i in range(len(self.text)):
-                charSize = self.font.size(self.text[i])[0]
+                charSize = fonts.get("Roboto", 26).size(self.text[i])[0]
                 pos = pos + charSize
                 if pos > event.pos[0]:
                     if pos - charSize / 2 > event.pos[0]:
@@ -86,6 +95,10 @@ class Textbox:
 
         return False
 
+    # return if the blinking cursor is currently visible
+    def is_cursor_visible(self):
+        return self.active and time() % 1 < 0.5
+
     # function that draws the textbox
     def draw(self, screen):
         # draw grey line under textbox
@@ -106,14 +119,14 @@ class Textbox:
                                 int(self.x + 7), int(self.y + self.height / 2 + 3), (255, 255, 255))
 
         # draw the text
-        text = self.font.render(self.default_text + self.text, True, (0, 0, 0))
+        text = fonts.get("Roboto", 26).render(self.default_text + self.text, True, (0, 0, 0))
         rect = text.get_rect()
         rect.x = self.x + 30
         rect.centery = self.y + self.height / 2
         screen.blit(text, rect)
 
         # draw added text in grey
-        added_text = self.number_font.render(
+        added_text = fonts.get("Arial", 18).render(
             self.added_text, True, (200, 200, 200))
         added_rect = added_text.get_rect()
         added_rect.x = rect.right + 3
@@ -121,13 +134,13 @@ class Textbox:
         screen.blit(added_text, added_rect)
 
         # draw cursor at right position if it's active
-        text1 = self.font.render(
+        text1 = fonts.get("Roboto", 26).render(
             self.default_text + self.text[:self.cursor_pos], True, (0, 0, 0))
         rect1 = text1.get_rect()
         rect1.x = self.x + 30
         rect1.centery = self.y + self.height / 2
 
-        if self.active and time() % 1 < 0.5:
+        if self.is_cursor_visible():
             pygame.draw.line(screen, (0, 0, 0), (rect1.right,
                              rect1.y + 1), (rect1.right, rect1.bottom - 1))
 